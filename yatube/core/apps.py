@@ -3,3 +3,11 @@ from django.apps import AppConfig
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from . import auth, db
+        auth.connect()
+        connection_created.connect(
+            db.configure_connection, dispatch_uid='configure_sqlite')
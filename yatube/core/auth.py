@@ -0,0 +1,68 @@
+"""Бэкенд аутентификации, который держит пользователя в кэше.
+
+AuthenticationMiddleware на каждом запросе достаёт пользователя по id из
+сессии. Здесь эта строка берётся из кэша; запись сбрасывается при любом
+сохранении или удалении пользователя, в том числе при смене пароля и
+обновлении last_login.
+
+Хэш пароля в кэш не попадает: вместо него хранится хэш сессии, который
+нужен для проверки сессии. Сам пароль дочитывается из базы, только если
+к нему обратились. QuerySet.update() сигналов не шлёт, поэтому
+пользователь, отключённый через update(), остаётся в кэше до конца
+USER_CACHE_TIMEOUT — срок поэтому короткий.
+"""
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.signals import post_delete, post_save
+
+
+USER_CACHE_TIMEOUT = 60 * 5
+# Поля, которые в кэш не кладутся и читаются из базы по требованию.
+UNCACHED_USER_FIELDS = {'password'}
+
+
+def user_cache_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+class CachedModelBackend(ModelBackend):
+
+    def get_user(self, user_id):
+        key = user_cache_key(user_id)
+        row = cache.get(key)
+        if row is not None:
+            return _unpack(row)
+        user = super().get_user(user_id)
+        if user is not None:
+            cache.set(key, _pack(user), USER_CACHE_TIMEOUT)
+        return user
+
+
+def _pack(user):
+    names = [
+        field.attname for field in user._meta.concrete_fields
+        if field.attname not in UNCACHED_USER_FIELDS]
+    return (
+        names, [getattr(user, name) for name in names],
+        user.get_session_auth_hash())
+
+
+def _unpack(row):
+    names, values, session_hash = row
+    # Пропущенные поля становятся отложенными и читаются при обращении.
+    user = get_user_model().from_db(DEFAULT_DB_ALIAS, names, values)
+    user.get_session_auth_hash = lambda: session_hash
+    return user
+
+
+def forget_user(sender, instance, **kwargs):
+    cache.delete(user_cache_key(instance.pk))
+
+
+def connect():
+    User = get_user_model()
+    post_save.connect(forget_user, sender=User, dispatch_uid='forget_user')
+    post_delete.connect(
+        forget_user, sender=User, dispatch_uid='forget_deleted_user')
@@ -0,0 +1,263 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.locmem import LocMemCache
+
+from . import metrics
+
+
+_missing = object()
+
+
+class InstrumentedCacheMixin:
+    """Считает попадания и промахи get и get_many в метрики запроса."""
+    _local = threading.local()
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _missing, version)
+        if getattr(self._local, 'batch', False):
+            return default if value is _missing else value
+        if value is _missing:
+            metrics.count_cache(0, 1)
+            return default
+        metrics.count_cache(1, 0)
+        return value
+
+    def get_many(self, keys, version=None):
+        # Базовый get_many ходит через get: внутри пачки не считаем.
+        keys = list(keys)
+        self._local.batch = True
+        try:
+            found = super().get_many(keys, version)
+        finally:
+            self._local.batch = False
+        metrics.count_cache(len(found), len(keys) - len(found))
+        return found
+
+
+class InstrumentedLocMemCache(InstrumentedCacheMixin, LocMemCache):
+    pass
+
+
+class SQLiteCache(BaseCache):
+    """Общий для процессов кэш в файле SQLite.
+
+    Все воркеры gunicorn на одной машине видят одни и те же записи,
+    поэтому сброс поколения в одном процессе виден остальным. Файл
+    открыт в режиме WAL: читатели не ждут писателя. Каждый поток держит
+    своё соединение; после fork соединение открывается заново.
+
+    Вытеснение — приближённый LRU: время доступа обновляется не чаще
+    раза в ACCESS_RESOLUTION секунд, а лишние записи удаляются раз в
+    CULL_EVERY записей. Целые числа хранятся как INTEGER, остальное —
+    pickle. Изменения идут в транзакциях BEGIN IMMEDIATE, поэтому add и
+    incr атомарны между процессами.
+    """
+    ACCESS_RESOLUTION = 1.0
+    CULL_EVERY = 100
+    # Сколько секунд запись ждёт другого писателя.
+    BUSY_TIMEOUT = 5
+    # Ограничение SQLite на число параметров запроса.
+    BATCH_SIZE = 500
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = location
+        self._local = threading.local()
+        self._writes = 0
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(
+                self._path, timeout=self.BUSY_TIMEOUT, isolation_level=None,
+                check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS cache ('
+                'key TEXT PRIMARY KEY, value BLOB NOT NULL, '
+                'expires REAL, accessed REAL NOT NULL) WITHOUT ROWID')
+            connection.execute(
+                'CREATE INDEX IF NOT EXISTS cache_accessed '
+                'ON cache (accessed)')
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    @contextmanager
+    def _write(self):
+        """Транзакция с блокировкой на запись с самого начала."""
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    @staticmethod
+    def _dump(value):
+        if type(value) is int and -2 ** 63 <= value < 2 ** 63:
+            return value
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _load(value):
+        return value if isinstance(value, int) else pickle.loads(value)
+
+    def _rows(self, keys, now):
+        """Живые строки по ключам; время доступа обновляет пачкой."""
+        connection = self._connection()
+        found = {}
+        stale = []
+        for start in range(0, len(keys), self.BATCH_SIZE):
+            batch = keys[start:start + self.BATCH_SIZE]
+            rows = connection.execute(
+                'SELECT key, value, expires, accessed FROM cache '
+                f'WHERE key IN ({", ".join("?" * len(batch))})', batch)
+            for key, value, expires, accessed in rows:
+                if expires is not None and expires <= now:
+                    continue
+                found[key] = value
+                if now - accessed > self.ACCESS_RESOLUTION:
+                    stale.append((now, key))
+        if stale:
+            self._touch(connection, stale)
+        return found
+
+    def _touch(self, connection, stale):
+        """Обновляет время доступа, не дожидаясь чужой блокировки.
+
+        На время UPDATE ожидание снимается: если база занята писателем,
+        запрос чтения не ждёт, а время доступа обновится при следующем
+        попадании.
+        """
+        connection.execute('PRAGMA busy_timeout = 0')
+        try:
+            connection.executemany(
+                'UPDATE cache SET accessed = ? WHERE key = ?', stale)
+        except sqlite3.OperationalError:
+            pass
+        finally:
+            connection.execute(
+                f'PRAGMA busy_timeout = {int(self.BUSY_TIMEOUT * 1000)}')
+
+    def _cull(self, connection, now):
+        connection.execute(
+            'DELETE FROM cache WHERE expires <= ?', [now])
+        count, = connection.execute('SELECT COUNT(*) FROM cache').fetchone()
+        if count <= self._max_entries:
+            return
+        # Как и в остальных бэкендах Django, CULL_FREQUENCY=0 — очистить всё.
+        excess = count
+        if self._cull_frequency:
+            excess = (
+                count - self._max_entries
+                + self._max_entries // self._cull_frequency)
+        connection.execute(
+            'DELETE FROM cache WHERE key IN ('
+            'SELECT key FROM cache ORDER BY accessed LIMIT ?)', [excess])
+
+    def _wrote(self, connection, now, count=1):
+        self._writes += count
+        if self._writes >= self.CULL_EVERY:
+            self._writes = 0
+            self._cull(connection, now)
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        found = self._rows([key], time.time())
+        return self._load(found[key]) if key in found else default
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        found = self._rows(list(keys), time.time())
+        return {keys[key]: self._load(value) for key, value in found.items()}
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        return key in self._rows([key], time.time())
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        now = time.time()
+        expires = self.get_backend_timeout(timeout)
+        rows = [
+            (self._key(key, version), self._dump(value), expires, now)
+            for key, value in data.items()]
+        with self._write() as connection:
+            connection.executemany(
+                'INSERT OR REPLACE INTO cache (key, value, expires, accessed) '
+                'VALUES (?, ?, ?, ?)', rows)
+            self._wrote(connection, now, len(rows))
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        with self._write() as connection:
+            connection.execute(
+                'DELETE FROM cache WHERE key = ? AND expires <= ?', [key, now])
+            added = connection.execute(
+                'INSERT OR IGNORE INTO cache (key, value, expires, accessed) '
+                'VALUES (?, ?, ?, ?)',
+                [key, self._dump(value), self.get_backend_timeout(timeout),
+                 now]).rowcount
+            if added:
+                self._wrote(connection, now)
+        return bool(added)
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        with self._write() as connection:
+            row = connection.execute(
+                'SELECT value FROM cache WHERE key = ? '
+                'AND (expires IS NULL OR expires > ?)', [key, now]).fetchone()
+            if row is None:
+                raise ValueError(f"Key '{key}' not found")
+            value = self._load(row[0]) + delta
+            connection.execute(
+                'UPDATE cache SET value = ?, accessed = ? WHERE key = ?',
+                [self._dump(value), now, key])
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        with self._write() as connection:
+            return bool(connection.execute(
+                'UPDATE cache SET expires = ?, accessed = ? WHERE key = ? '
+                'AND (expires IS NULL OR expires > ?)',
+                [self.get_backend_timeout(timeout), now, key, now]).rowcount)
+
+    def delete(self, key, version=None):
+        return bool(self.delete_many([key], version))
+
+    def delete_many(self, keys, version=None):
+        keys = [(self._key(key, version),) for key in keys]
+        with self._write() as connection:
+            return connection.executemany(
+                'DELETE FROM cache WHERE key = ?', keys).rowcount
+
+    def clear(self):
+        with self._write() as connection:
+            connection.execute('DELETE FROM cache')
+
+
+class InstrumentedSQLiteCache(InstrumentedCacheMixin, SQLiteCache):
+    pass
@@ -1,5 +1,8 @@
+from django.utils.functional import SimpleLazyObject
+
+
 def get_username(request):
-    name = request.user.username
+    """Имя пользователя; сессия и пользователь грузятся при обращении."""
     return {
-        'name': name
+        'name': SimpleLazyObject(lambda: request.user.username)
     }
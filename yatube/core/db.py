@@ -0,0 +1,65 @@
+"""Настройка SQLite под нагрузку и повтор транзакций при блокировке.
+
+WAL позволяет читателям не ждать писателя, но писатель в SQLite всё
+равно один. Отложенная транзакция, которая сначала читала, а потом
+пишет, может получить «database is locked» сразу, не дожидаясь
+busy_timeout: её снимок уже устарел. Такую транзакцию надо начать
+заново — это и делает write_transaction.
+"""
+import random
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+from django.db import transaction
+
+
+WRITE_ATTEMPTS = 5
+WRITE_BASE_DELAY = 0.02
+
+
+def apply_pragmas(cursor, pragmas):
+    for name, value in pragmas.items():
+        cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def configure_connection(sender, connection, **kwargs):
+    """Обработчик connection_created: прагмы для каждого соединения."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        apply_pragmas(cursor, getattr(settings, 'SQLITE_PRAGMAS', {}))
+
+
+def is_locked(error):
+    message = str(error).lower()
+    return 'locked' in message or 'busy' in message
+
+
+def write_transaction(view=None, *, attempts=WRITE_ATTEMPTS,
+                      base_delay=WRITE_BASE_DELAY, using=DEFAULT_DB_ALIAS):
+    """Выполняет функцию в транзакции и повторяет её при блокировке.
+
+    Паузы растут экспоненциально со случайной добавкой, чтобы
+    столкнувшиеся писатели не повторяли попытки одновременно. Внутри
+    чужой транзакции повторять нечего: она уже сломана, поэтому там
+    функция выполняется как есть.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if connections[using].in_atomic_block:
+                return func(*args, **kwargs)
+            for attempt in range(attempts):
+                try:
+                    with transaction.atomic(using=using):
+                        return func(*args, **kwargs)
+                except OperationalError as error:
+                    if not is_locked(error) or attempt == attempts - 1:
+                        raise
+                time.sleep(base_delay * 2 ** attempt * (1 + random.random()))
+        return wrapper
+    if view is not None:
+        return decorator(view)
+    return decorator
@@ -0,0 +1,64 @@
+"""Дыры в кэшированных страницах.
+
+Общая для всех копия страницы не должна зависеть от пользователя.
+Вместо личных фрагментов — меню, кнопки подписки, формы комментария —
+шаблон оставляет метку {% hole %}, а HoleMiddleware на каждом запросе
+заменяет метки фрагментами, отрисованными для текущего пользователя.
+"""
+import base64
+import json
+import re
+
+from django.template.loader import render_to_string
+
+
+HOLES = {}
+MARKER = re.compile(rb'<!--hole:(\w+):([\w=-]*)-->')
+
+
+def register(name, template=None):
+    """Регистрирует фрагмент.
+
+    Функция получает запрос и параметры метки и возвращает контекст
+    шаблона template либо, если шаблон не задан, готовую строку.
+    """
+    def decorator(func):
+        HOLES[name] = (func, template)
+        return func
+    return decorator
+
+
+def placeholder(name, **params):
+    if name not in HOLES:
+        raise KeyError(f'Неизвестная дыра {name}')
+    raw = json.dumps(params, sort_keys=True, separators=(',', ':'))
+    encoded = base64.urlsafe_b64encode(raw.encode()).decode()
+    return f'<!--hole:{name}:{encoded}-->'
+
+
+def render(request, name, params):
+    func, template = HOLES[name]
+    result = func(request, **params)
+    if template is None:
+        return result
+    return render_to_string(template, result, request=request)
+
+
+def fill(request, content):
+    """Заполняет метки в байтах страницы; одинаковые рисует один раз."""
+    rendered = {}
+
+    def replace(match):
+        if match.group(0) not in rendered:
+            params = json.loads(base64.urlsafe_b64decode(match.group(2)))
+            rendered[match.group(0)] = render(
+                request, match.group(1).decode(), params).encode()
+        return rendered[match.group(0)]
+
+    return MARKER.sub(replace, content)
+
+
+@register('header_user', 'includes/header_user.html')
+def header_user(request):
+    match = request.resolver_match
+    return {'view_name': match.view_name if match else None}
@@ -0,0 +1,124 @@
+import json
+import os
+import shutil
+import tempfile
+from multiprocessing import get_context
+from time import perf_counter
+
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand, CommandError
+
+from core.cache import SQLiteCache
+
+
+BACKENDS = ('locmem', 'file', 'sqlite')
+BATCH = 10
+
+
+def make_cache(backend, directory):
+    params = {'OPTIONS': {'MAX_ENTRIES': 1_000_000}}
+    if backend == 'locmem':
+        return LocMemCache('bench', params)
+    if backend == 'file':
+        return FileBasedCache(os.path.join(directory, 'file'), params)
+    return SQLiteCache(os.path.join(directory, 'cache.sqlite3'), params)
+
+
+def run_operations(backend, directory, ops, keys, value):
+    """Время каждой операции на ops повторах; вызывается в воркере."""
+    cache = make_cache(backend, directory)
+    names = [f'key-{index % keys}' for index in range(ops)]
+    batches = [
+        names[start:start + BATCH] for start in range(0, ops, BATCH)]
+    cache.set('counter', 0)
+    operations = {
+        'set': lambda: [cache.set(name, value) for name in names],
+        'get': lambda: [cache.get(name) for name in names],
+        'set_many': lambda: [
+            cache.set_many(dict.fromkeys(batch, value)) for batch in batches],
+        'get_many': lambda: [cache.get_many(batch) for batch in batches],
+        'incr': lambda: [cache.incr('counter') for _ in names],
+    }
+    seconds = {}
+    for name, operation in operations.items():
+        started = perf_counter()
+        operation()
+        seconds[name] = perf_counter() - started
+    return seconds
+
+
+def shared_keys(backend, directory, keys):
+    """Сколько ключей, записанных другим процессом, видно здесь."""
+    cache = make_cache(backend, directory)
+    found = cache.get_many([f'shared-{index}' for index in range(keys)])
+    return len(found)
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает кэш в памяти, файловый кэш и SQLiteCache: '
+            'операции в секунду и видимость записей между процессами.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ops', type=int, default=5000,
+            help='Сколько раз повторить каждую операцию в процессе.')
+        parser.add_argument(
+            '--keys', type=int, default=1000,
+            help='Сколько разных ключей использовать.')
+        parser.add_argument(
+            '--value-size', type=int, default=2048,
+            help='Размер значения в байтах.')
+        parser.add_argument(
+            '--processes', type=int, default=1,
+            help='Сколько процессов нагружают кэш одновременно.')
+        parser.add_argument(
+            '--backend', action='append', choices=BACKENDS,
+            help='Какие бэкенды мерить; по умолчанию все.')
+        parser.add_argument('--output', help='Файл для результатов JSON.')
+
+    def handle(self, *args, **options):
+        if options['ops'] < 1 or options['processes'] < 1:
+            raise CommandError('Нужна хотя бы одна операция и один процесс')
+        context = get_context('spawn')
+        value = 'x' * options['value_size']
+        results = {}
+        for backend in options['backend'] or BACKENDS:
+            directory = tempfile.mkdtemp()
+            try:
+                with context.Pool(options['processes']) as pool:
+                    runs = pool.starmap(run_operations, [
+                        (backend, directory, options['ops'],
+                         options['keys'], value)
+                    ] * options['processes'])
+                    make_cache(backend, directory).set_many({
+                        f'shared-{index}': value
+                        for index in range(options['keys'])})
+                    visible = pool.apply(
+                        shared_keys, (backend, directory, options['keys']))
+            finally:
+                shutil.rmtree(directory, ignore_errors=True)
+            results[backend] = self.summary(
+                runs, options, visible / options['keys'])
+            self.stdout.write(backend + ': ' + ' '.join(
+                f'{name}={rate:,.0f}/с'
+                for name, rate in results[backend]['ops_per_second'].items()
+            ) + f' видно из другого процесса={results[backend]["shared"]:.0%}')
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as stream:
+                json.dump({
+                    'ops': options['ops'],
+                    'keys': options['keys'],
+                    'value_size': options['value_size'],
+                    'processes': options['processes'],
+                    'backends': results,
+                }, stream, ensure_ascii=False, indent=2)
+
+    def summary(self, runs, options, shared):
+        """Суммарная пропускная способность всех процессов."""
+        rates = {}
+        for name in runs[0]:
+            # Пакетные операции считаем по ключам, а не по вызовам.
+            slowest = max(run[name] for run in runs)
+            rates[name] = options['ops'] * len(runs) / slowest
+        return {'ops_per_second': rates, 'shared': shared}
@@ -0,0 +1,193 @@
+import json
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+from time import perf_counter, sleep
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from core import db
+
+
+# Профиль по умолчанию — как было до настройки: журнал отката, полная
+# синхронизация, таймаут модуля sqlite3 и никаких повторов.
+PROFILES = {
+    'default': {
+        'timeout': 5.0,
+        'pragmas': {'journal_mode': 'DELETE', 'synchronous': 'FULL'},
+        'retry': False,
+    },
+    'tuned': {
+        'timeout': settings.DATABASES['default'].get(
+            'OPTIONS', {}).get('timeout', 5.0),
+        'pragmas': getattr(settings, 'SQLITE_PRAGMAS', {}),
+        'retry': True,
+    },
+}
+PERCENTILE = 95
+
+
+class Worker(threading.Thread):
+    """Поток со своим соединением; крутит операцию до остановки."""
+
+    def __init__(self, path, profile, operation, stop):
+        super().__init__(daemon=True)
+        self.connection = sqlite3.connect(
+            path, timeout=profile['timeout'], isolation_level=None,
+            check_same_thread=False)
+        db.apply_pragmas(self.connection, profile['pragmas'])
+        self.retry = profile['retry']
+        self.operation = operation
+        self.stop = stop
+        self.timings = []
+        self.errors = 0
+
+    def run(self):
+        while not self.stop.is_set():
+            started = perf_counter()
+            if self.attempt():
+                self.timings.append(perf_counter() - started)
+
+    def attempt(self):
+        attempts = db.WRITE_ATTEMPTS if self.retry else 1
+        for number in range(attempts):
+            try:
+                self.operation(self.connection)
+                return True
+            except sqlite3.OperationalError as error:
+                if self.connection.in_transaction:
+                    self.connection.execute('ROLLBACK')
+                if not db.is_locked(error):
+                    raise
+            if number < attempts - 1:
+                sleep(db.WRITE_BASE_DELAY * 2 ** number
+                      * (1 + random.random()))
+        self.errors += 1
+        return False
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает исходные настройки SQLite и профиль из settings '
+            'на копии базы: одновременные add_comment и чтение ленты.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument(
+            '--seconds', type=float, default=5.0,
+            help='Сколько длится прогон одного профиля.')
+        parser.add_argument(
+            '--profile', action='append', choices=PROFILES,
+            help='Какие профили мерить; по умолчанию все.')
+        parser.add_argument('--output', help='Файл для результатов JSON.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Бенчмарк написан для SQLite')
+        connection.ensure_connection()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT (SELECT MAX(id) FROM posts_post), '
+                '(SELECT MAX(id) FROM auth_user)')
+            self.max_post, self.max_user = cursor.fetchone()
+        if not self.max_post:
+            raise CommandError('База пуста: сначала запустите seed_data')
+        results = {}
+        for name in options['profile'] or PROFILES:
+            results[name] = self.run_profile(PROFILES[name], options)
+            self.stdout.write(
+                f'{name:<8} ' + ' '.join(
+                    f'{kind}: {row["ops_per_second"]:,.0f}/с '
+                    f'p{PERCENTILE}={row[f"p{PERCENTILE}_ms"]:.1f} мс '
+                    f'ошибок={row["errors"]}'
+                    for kind, row in results[name].items()))
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as stream:
+                json.dump({
+                    'writers': options['writers'],
+                    'readers': options['readers'],
+                    'seconds': options['seconds'],
+                    'profiles': results,
+                }, stream, ensure_ascii=False, indent=2)
+
+    def copy_database(self, directory, profile):
+        path = os.path.join(directory, 'bench.sqlite3')
+        target = sqlite3.connect(path)
+        connection.connection.backup(target)
+        target.execute(
+            f'PRAGMA journal_mode = {profile["pragmas"]["journal_mode"]}')
+        target.close()
+        return path
+
+    def write(self, connection):
+        """Как add_comment: прочитать пост, вставить комментарий, счётчик."""
+        post_id = random.randint(1, self.max_post)
+        connection.execute('BEGIN')
+        if connection.execute(
+                'SELECT id FROM posts_post WHERE id = ?',
+                [post_id]).fetchone():
+            created = timezone.now().strftime('%Y-%m-%d %H:%M:%S.%f')
+            connection.execute(
+                'INSERT INTO posts_comment (post_id, author_id, text, '
+                'created) VALUES (?, ?, ?, ?)',
+                [post_id, random.randint(1, self.max_user), 'Бенчмарк',
+                 created])
+            connection.execute(
+                'UPDATE posts_post SET comments_count = comments_count + 1, '
+                'last_comment_at = ?, version = version + 1 WHERE id = ?',
+                [created, post_id])
+        connection.execute('COMMIT')
+
+    def read(self, connection):
+        """Как index: страница постов с авторами и группами."""
+        connection.execute(
+            'SELECT post.id, post.text, user.username, grp.slug '
+            'FROM posts_post post '
+            'JOIN auth_user user ON user.id = post.author_id '
+            'LEFT JOIN posts_group grp ON grp.id = post.group_id '
+            'ORDER BY post.pub_date DESC LIMIT 10 OFFSET ?',
+            [random.randint(0, 100)]).fetchall()
+
+    def run_profile(self, profile, options):
+        directory = tempfile.mkdtemp()
+        try:
+            path = self.copy_database(directory, profile)
+            stop = threading.Event()
+            workers = {
+                'write': [
+                    Worker(path, profile, self.write, stop)
+                    for _ in range(options['writers'])],
+                'read': [
+                    Worker(path, profile, self.read, stop)
+                    for _ in range(options['readers'])],
+            }
+            for group in workers.values():
+                for worker in group:
+                    worker.start()
+            sleep(options['seconds'])
+            stop.set()
+            for group in workers.values():
+                for worker in group:
+                    worker.join()
+                    worker.connection.close()
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+        return {
+            kind: self.summary(group, options['seconds'])
+            for kind, group in workers.items()}
+
+    def summary(self, workers, seconds):
+        timings = sorted(
+            timing for worker in workers for timing in worker.timings)
+        index = max(0, -(-PERCENTILE * len(timings) // 100) - 1)
+        return {
+            'ops_per_second': len(timings) / seconds,
+            f'p{PERCENTILE}_ms': timings[index] * 1000 if timings else 0.0,
+            'errors': sum(worker.errors for worker in workers),
+        }
@@ -0,0 +1,34 @@
+from django.db import connection
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = ('Обслуживание SQLite: обновляет статистику планировщика, '
+            'сбрасывает WAL в основной файл и при желании сжимает базу. '
+            'Запускать по расписанию, например раз в сутки из cron.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--analyze', action='store_true',
+            help='Полный ANALYZE вместо PRAGMA optimize.')
+        parser.add_argument(
+            '--vacuum', action='store_true',
+            help='Перестроить файл базы; блокирует запись на время работы.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Команда нужна только для SQLite')
+        with connection.cursor() as cursor:
+            if options['analyze']:
+                cursor.execute('ANALYZE')
+            else:
+                cursor.execute('PRAGMA optimize')
+            cursor.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+            busy, log_frames, checkpointed = cursor.fetchone()
+            if options['vacuum']:
+                cursor.execute('VACUUM')
+        self.stdout.write(
+            f'Статистика обновлена; WAL: страниц {log_frames}, '
+            f'перенесено {checkpointed}'
+            + (', база занята' if busy else '')
+            + (', файл перестроен' if options['vacuum'] else ''))
@@ -0,0 +1,232 @@
+"""Метрики запросов в памяти процесса в текстовом формате Prometheus.
+
+Каждый поток пишет в свой шард, поэтому на запись блокировки не нужны:
+общий замок берётся только при первом обращении потока и при выгрузке.
+Шард завершившегося потока сливается в общий итог и больше не хранится.
+Память ограничена: бакеты фиксированы, а число различных меток view не
+превышает MAX_VIEWS — остальные попадают в метку 'other'.
+"""
+import threading
+import weakref
+from bisect import bisect_left
+from contextlib import contextmanager
+from time import perf_counter
+
+
+SECONDS_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+MAX_VIEWS = 200
+OTHER_VIEW = 'other'
+
+HISTOGRAMS = {
+    'yatube_request_seconds': (
+        'Полное время ответа view.', SECONDS_BUCKETS),
+    'yatube_db_seconds': (
+        'Время запросов к базе за один ответ.', SECONDS_BUCKETS),
+    'yatube_db_queries': (
+        'Число запросов к базе за один ответ.', QUERY_BUCKETS),
+    'yatube_template_seconds': (
+        'Время рендеринга шаблонов за один ответ.', SECONDS_BUCKETS),
+}
+COUNTERS = {
+    'yatube_cache_hits_total': 'Попадания в кэш.',
+    'yatube_cache_misses_total': 'Промахи кэша.',
+}
+
+# RLock: финализатор шарда может сработать при сборке мусора в потоке,
+# который уже держит замок.
+_lock = threading.RLock()
+_shards = []
+# Итог шардов потоков, которые уже завершились.
+_retired = {}
+_views = set()
+_local = threading.local()
+
+
+class RequestStats:
+    """Затраты одного запроса; копятся, пока запрос обрабатывается."""
+
+    def __init__(self):
+        self.db_seconds = 0.0
+        self.queries = 0
+        self.template_seconds = 0.0
+        self.template_depth = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+
+def current():
+    """Статистика запроса, который обрабатывает этот поток, или None."""
+    return getattr(_local, 'stats', None)
+
+
+@contextmanager
+def collect():
+    _local.stats = stats = RequestStats()
+    try:
+        yield stats
+    finally:
+        _local.stats = None
+
+
+class _Owner:
+    """Хозяин шарда в threading.local: умирает вместе с потоком."""
+    __slots__ = ('shard', '__weakref__')
+
+
+def _shard():
+    owner = getattr(_local, 'owner', None)
+    if owner is None:
+        owner = _local.owner = _Owner()
+        owner.shard = {}
+        with _lock:
+            _shards.append(owner.shard)
+        weakref.finalize(owner, _retire, owner.shard)
+    return owner.shard
+
+
+def _retire(shard):
+    with _lock:
+        for index, item in enumerate(_shards):
+            if item is shard:
+                del _shards[index]
+                _merge(_retired, shard)
+                break
+
+
+def _merge(total, shard):
+    for key, value in list(shard.items()):
+        if isinstance(value, list):
+            merged = total.setdefault(key, [0] * len(value))
+            for index, item in enumerate(value):
+                merged[index] += item
+        else:
+            total[key] = total.get(key, 0) + value
+
+
+def view_label(view):
+    if view in _views:
+        return view
+    if len(_views) >= MAX_VIEWS:
+        return OTHER_VIEW
+    _views.add(view)
+    return view
+
+
+def observe(name, view, value):
+    """Кладёт значение в гистограмму: бакеты, затем счётчик и сумма."""
+    buckets = HISTOGRAMS[name][1]
+    shard = _shard()
+    key = (name, view)
+    row = shard.get(key)
+    if row is None:
+        row = shard[key] = [0] * (len(buckets) + 3)
+    row[bisect_left(buckets, value)] += 1
+    row[-2] += 1
+    row[-1] += value
+
+
+def inc(name, view, amount=1):
+    if not amount:
+        return
+    shard = _shard()
+    key = (name, view)
+    shard[key] = shard.get(key, 0) + amount
+
+
+def record(view, seconds, stats):
+    view = view_label(view)
+    observe('yatube_request_seconds', view, seconds)
+    observe('yatube_db_seconds', view, stats.db_seconds)
+    observe('yatube_db_queries', view, stats.queries)
+    observe('yatube_template_seconds', view, stats.template_seconds)
+    inc('yatube_cache_hits_total', view, stats.cache_hits)
+    inc('yatube_cache_misses_total', view, stats.cache_misses)
+
+
+def count_cache(hits, misses):
+    stats = current()
+    if stats is not None:
+        stats.cache_hits += hits
+        stats.cache_misses += misses
+
+
+@contextmanager
+def time_template():
+    """Замеряет рендеринг; вложенные шаблоны не считаются второй раз."""
+    stats = current()
+    if stats is None:
+        yield
+        return
+    stats.template_depth += 1
+    started = perf_counter()
+    try:
+        yield
+    finally:
+        stats.template_depth -= 1
+        if not stats.template_depth:
+            stats.template_seconds += perf_counter() - started
+
+
+def db_wrapper(execute, sql, params, many, context):
+    """execute_wrapper для connection: время и число запросов."""
+    stats = current()
+    started = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        if stats is not None:
+            stats.db_seconds += perf_counter() - started
+            stats.queries += 1
+
+
+def snapshot():
+    """Сумма всех шардов и итога завершившихся потоков."""
+    total = {}
+    with _lock:
+        shards = list(_shards)
+        _merge(total, _retired)
+    for shard in shards:
+        _merge(total, shard)
+    return total
+
+
+def reset():
+    with _lock:
+        for shard in _shards:
+            shard.clear()
+        _retired.clear()
+        _views.clear()
+
+
+def _format(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render():
+    """Выгрузка в текстовом формате Prometheus 0.0.4."""
+    total = snapshot()
+    lines = []
+    for name, (help_text, buckets) in HISTOGRAMS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} histogram')
+        for (metric, view), row in sorted(total.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, count in zip(
+                    (*buckets, '+Inf'), row[:len(buckets) + 1]):
+                cumulative += count
+                lines.append(
+                    f'{name}_bucket{{view="{view}",le="{bound}"}} '
+                    f'{cumulative}')
+            lines.append(f'{name}_sum{{view="{view}"}} {_format(row[-1])}')
+            lines.append(f'{name}_count{{view="{view}"}} {row[-2]}')
+    for name, help_text in COUNTERS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} counter')
+        for (metric, view), value in sorted(total.items()):
+            if metric == name:
+                lines.append(f'{name}{{view="{view}"}} {value}')
+    return '\n'.join(lines) + '\n'
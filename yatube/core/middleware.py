@@ -0,0 +1,51 @@
+from contextlib import ExitStack
+from time import perf_counter
+
+from django.db import connections
+
+from . import holes, metrics
+
+
+class MetricsMiddleware:
+    """Пишет в метрики время ответа, работу с базой, шаблоны и кэш.
+
+    Метка — имя маршрута, например posts:index, поэтому число меток
+    не зависит от адресов запросов.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = perf_counter()
+        with metrics.collect() as stats, ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(
+                    connection.execute_wrapper(metrics.db_wrapper))
+            response = self.get_response(request)
+            # Отложенный рендеринг TemplateResponse тоже попадает в замер.
+            seconds = perf_counter() - started
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else '<unresolved>'
+        metrics.record(view, seconds, stats)
+        return response
+
+
+class HoleMiddleware:
+    """Заполняет дыры страницы фрагментами для текущего пользователя.
+
+    Стоит последним в MIDDLEWARE: ответ уже отрисован и, возможно, взят
+    из кэша, а сессия и CSRF ещё успеют отметить, что фрагменты их
+    прочитали.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (not response.streaming
+                and response.get('Content-Type', '').startswith('text/html')
+                and b'<!--hole:' in response.content):
+            response.content = holes.fill(request, response.content)
+        return response
@@ -0,0 +1,77 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..auth import CachedModelBackend, user_cache_key
+from ..context_processors.get_username import get_username
+
+User = get_user_model()
+
+
+class CachedUserTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def test_user_read_from_cache(self):
+        """Повторный запрос не читает ни сессию, ни пользователя из базы."""
+        address = reverse('about:author')
+        self.client.get(address)
+        with self.assertNumQueries(0):
+            response = self.client.get(address)
+        self.assertContains(response, self.user.username)
+
+    def test_save_invalidates_user(self):
+        backend = CachedModelBackend()
+        backend.get_user(self.user.pk)
+        user = User.objects.get(pk=self.user.pk)
+        user.first_name = 'Новое'
+        user.save()
+        self.assertEqual(backend.get_user(self.user.pk).first_name, 'Новое')
+
+    def test_inactive_user_logged_out(self):
+        backend = CachedModelBackend()
+        backend.get_user(self.user.pk)
+        user = User.objects.get(pk=self.user.pk)
+        user.is_active = False
+        user.save()
+        self.assertIsNone(backend.get_user(self.user.pk))
+
+    def test_password_not_cached(self):
+        user = User.objects.get(pk=self.user.pk)
+        user.set_password('секрет-123')
+        user.save()
+        self.client.force_login(user)
+        address = reverse('about:author')
+        self.client.get(address)
+        self.assertNotIn(
+            user.password, str(cache.get(user_cache_key(user.pk))))
+        with self.assertNumQueries(0):
+            response = self.client.get(address)
+        self.assertEqual(response.wsgi_request.user, user)
+        cached = CachedModelBackend().get_user(user.pk)
+        self.assertTrue(cached.check_password('секрет-123'))
+
+    def test_old_sessions_kept(self):
+        """Сессии со старым бэкендом после выкладки не сбрасываются."""
+        client = Client()
+        client.force_login(
+            self.user, backend='django.contrib.auth.backends.ModelBackend')
+        response = client.get(reverse('about:author'))
+        self.assertEqual(response.wsgi_request.user, self.user)
+
+    def test_username_is_lazy(self):
+        """Пока имя не нужно шаблону, request.user не трогается."""
+        class Request:
+            @property
+            def user(self):
+                raise AssertionError('request.user прочитан')
+
+        get_username(Request())
@@ -0,0 +1,105 @@
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+from io import StringIO
+from multiprocessing import get_context
+from time import perf_counter
+
+from django.core.management import call_command
+from django.test import SimpleTestCase
+
+from ..cache import SQLiteCache
+
+
+def _incr_many(path, times):
+    cache = SQLiteCache(path, {})
+    for _ in range(times):
+        cache.incr('counter')
+
+
+class SQLiteCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'cache.sqlite3')
+        self.cache = SQLiteCache(self.path, {})
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def test_get_set_many(self):
+        self.cache.set('number', 1)
+        self.cache.set_many({'text': 'строка', 'rows': [1, 2]})
+        self.assertEqual(self.cache.get('number'), 1)
+        self.assertEqual(
+            self.cache.get_many(['text', 'rows', 'missing']),
+            {'text': 'строка', 'rows': [1, 2]})
+        self.assertIsNone(self.cache.get('missing'))
+
+    def test_expired_entries_missing(self):
+        self.cache.set('old', 1, timeout=-1)
+        self.assertIsNone(self.cache.get('old'))
+        self.assertTrue(self.cache.add('old', 2))
+        self.assertFalse(self.cache.add('old', 3))
+        self.assertEqual(self.cache.get('old'), 2)
+
+    def test_delete_and_clear(self):
+        self.cache.set_many({'a': 1, 'b': 2, 'c': 3})
+        self.assertTrue(self.cache.delete('a'))
+        self.cache.delete_many(['b'])
+        self.assertEqual(self.cache.get_many(['a', 'b', 'c']), {'c': 3})
+        self.cache.clear()
+        self.assertIsNone(self.cache.get('c'))
+
+    def test_incr(self):
+        self.cache.set('counter', 1)
+        self.assertEqual(self.cache.incr('counter', 5), 6)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_read_not_blocked_by_writer(self):
+        """Чтение не ждёт чужую блокировку ради времени доступа."""
+        self.cache.set('key', 1)
+        self.cache.ACCESS_RESOLUTION = 0
+        writer = sqlite3.connect(self.path, isolation_level=None)
+        self.addCleanup(writer.close)
+        writer.execute('BEGIN IMMEDIATE')
+        started = perf_counter()
+        self.assertEqual(self.cache.get('key'), 1)
+        self.assertLess(perf_counter() - started, 1)
+        writer.execute('ROLLBACK')
+
+    def test_incr_shared_between_processes(self):
+        """Воркеры видят одну запись и не теряют приращения."""
+        self.cache.set('counter', 0)
+        context = get_context('spawn')
+        workers = [
+            context.Process(target=_incr_many, args=(self.path, 50))
+            for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(self.cache.get('counter'), 200)
+
+    def test_lru_eviction(self):
+        cache = SQLiteCache(
+            self.path, {'OPTIONS': {'MAX_ENTRIES': 10, 'CULL_FREQUENCY': 10}})
+        cache.CULL_EVERY = 1
+        cache.ACCESS_RESOLUTION = 0
+        cache.set('hot', 1)
+        for index in range(20):
+            cache.set(f'key-{index}', index)
+            cache.get('hot')
+        self.assertEqual(cache.get('hot'), 1)
+        self.assertIsNone(cache.get('key-0'))
+
+    def test_bench_cache(self):
+        output = os.path.join(self.directory, 'bench.json')
+        call_command(
+            'bench_cache', ops=20, keys=5, backend=['locmem', 'sqlite'],
+            output=output, stdout=StringIO())
+        with open(output, encoding='utf-8') as stream:
+            report = json.load(stream)
+        self.assertEqual(report['backends']['locmem']['shared'], 0)
+        self.assertEqual(report['backends']['sqlite']['shared'], 1)
+        self.assertIn('incr', report['backends']['sqlite']['ops_per_second'])
@@ -0,0 +1,82 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase
+
+from posts.models import Post
+
+from .. import db
+
+User = get_user_model()
+
+
+class PragmaTest(TestCase):
+    def test_pragmas_applied(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
+            cursor.execute('PRAGMA temp_store')
+            self.assertEqual(cursor.fetchone()[0], 2)
+
+
+@mock.patch.object(db.time, 'sleep')
+class WriteTransactionTest(TransactionTestCase):
+    def flaky(self, failures, message='database is locked'):
+        calls = []
+
+        @db.write_transaction
+        def write():
+            calls.append(connection.in_atomic_block)
+            if len(calls) <= failures:
+                raise OperationalError(message)
+            return 'готово'
+
+        return write, calls
+
+    def test_retries_locked(self, sleep):
+        write, calls = self.flaky(2)
+        self.assertEqual(write(), 'готово')
+        self.assertEqual(calls, [True, True, True])
+        self.assertEqual(sleep.call_count, 2)
+
+    def test_gives_up(self, sleep):
+        write, calls = self.flaky(db.WRITE_ATTEMPTS)
+        with self.assertRaises(OperationalError):
+            write()
+        self.assertEqual(len(calls), db.WRITE_ATTEMPTS)
+
+    def test_other_errors_not_retried(self, sleep):
+        write, calls = self.flaky(1, 'no such table')
+        with self.assertRaises(OperationalError):
+            write()
+        self.assertEqual(len(calls), 1)
+
+
+class MaintenanceTest(TransactionTestCase):
+    def test_optimize_db(self):
+        output = StringIO()
+        call_command('optimize_db', analyze=True, stdout=output)
+        self.assertIn('Статистика обновлена', output.getvalue())
+
+    def test_bench_db(self):
+        author = User.objects.create(username='author')
+        Post.objects.create(author=author, text='Пост')
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        output = os.path.join(directory, 'bench.json')
+        call_command(
+            'bench_db', writers=2, readers=2, seconds=0.2, output=output,
+            stdout=StringIO())
+        with open(output, encoding='utf-8') as stream:
+            report = json.load(stream)
+        self.assertGreater(
+            report['profiles']['tuned']['write']['ops_per_second'], 0)
+        self.assertGreater(
+            report['profiles']['default']['read']['ops_per_second'], 0)
@@ -0,0 +1,87 @@
+import threading
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core import metrics
+
+
+User = get_user_model()
+
+
+class MetricsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.staff = User.objects.create(username='staff', is_staff=True)
+        cls.staff_client = Client()
+        cls.staff_client.force_login(cls.staff)
+
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+
+    def value(self, name, view):
+        return metrics.snapshot()[(name, view)]
+
+    def test_request_recorded(self):
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:index'))
+        row = self.value('yatube_request_seconds', 'posts:index')
+        self.assertEqual(row[-2], 2)
+        self.assertGreater(row[-1], 0)
+        queries = self.value('yatube_db_queries', 'posts:index')
+        self.assertGreater(queries[-1], 0)
+        templates = self.value('yatube_template_seconds', 'posts:index')
+        self.assertGreater(templates[-1], 0)
+        self.assertGreater(
+            self.value('yatube_cache_hits_total', 'posts:index'), 0)
+        self.assertGreater(
+            self.value('yatube_cache_misses_total', 'posts:index'), 0)
+
+    def test_thread_shard_retired(self):
+        """Шард завершившегося потока не копится, а его счёт сохраняется."""
+        metrics.inc('yatube_cache_hits_total', 'view')
+        shards = len(metrics._shards)
+        threads = [
+            threading.Thread(
+                target=metrics.inc, args=('yatube_cache_hits_total', 'view'))
+            for _ in range(5)]
+        for thread in threads:
+            thread.start()
+            thread.join()
+        self.assertEqual(len(metrics._shards), shards)
+        self.assertEqual(self.value('yatube_cache_hits_total', 'view'), 6)
+
+    def test_view_labels_bounded(self):
+        with mock.patch.object(metrics, 'MAX_VIEWS', 1):
+            self.client.get(reverse('posts:index'))
+            self.client.get(reverse('about:author'))
+        self.assertIn(
+            ('yatube_request_seconds', metrics.OTHER_VIEW),
+            metrics.snapshot())
+
+    def test_endpoint_requires_staff(self):
+        address = reverse('metrics')
+        self.assertEqual(self.client.get(address).status_code, 403)
+        self.client.get(reverse('posts:index'))
+        response = self.staff_client.get(address)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(
+            response, 'yatube_request_seconds_count{view="posts:index"} 1')
+        self.assertContains(
+            response,
+            'yatube_request_seconds_bucket{view="posts:index",le="+Inf"} 1')
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_endpoint_token(self):
+        address = reverse('metrics')
+        response = self.client.get(
+            address, HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(
+            address, HTTP_AUTHORIZATION='Bearer wrong')
+        self.assertEqual(response.status_code, 403)
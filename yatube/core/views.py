@@ -1,4 +1,9 @@
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
 from django.shortcuts import render
+from django.utils.crypto import constant_time_compare
+
+from . import metrics
 
 
 def page_not_found(request, exception):
@@ -15,3 +20,15 @@ def csrf_failure(request, reason=''):
 
 def handler500(request):
     return render(request, 'core/500.html')
+
+
+def metrics_view(request):
+    """Метрики для Prometheus: сотрудникам или по METRICS_TOKEN."""
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    authorization = request.META.get('HTTP_AUTHORIZATION', '')
+    if not (request.user.is_staff or (
+            token and constant_time_compare(
+                authorization, f'Bearer {token}'))):
+        return HttpResponseForbidden()
+    return HttpResponse(
+        metrics.render(), content_type='text/plain; version=0.0.4')
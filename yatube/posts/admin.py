@@ -1,17 +1,108 @@
 from django.contrib import admin
 
+from . import feed, generations, search, stats
 from .models import Post, Group, Comment, Follow
 
 
-class PostAdmin(admin.ModelAdmin):
+class FullTextSearchMixin:
+    """Поиск в админке через индекс FTS5 вместо LIKE '%...%'."""
+
+    def get_search_results(self, request, queryset, search_term):
+        match = search.build_match(search_term)
+        if not match or not search.available():
+            return super().get_search_results(
+                request, queryset, search_term)
+        return queryset.filter(pk__in=self.search_subquery(match)), False
+
+
+class PostAdmin(FullTextSearchMixin, admin.ModelAdmin):
     list_display = ('pk', 'text', 'pub_date', 'author', 'group',)
     search_fields = ('text',)
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
     list_editable = ('group',)
+    search_subquery = staticmethod(search.matching_post_ids)
+
+    def save_model(self, request, obj, form, change):
+        old_group_id = form.initial.get('group') if change else None
+        super().save_model(request, obj, form, change)
+        if old_group_id and old_group_id != obj.group_id:
+            old_slug = Group.objects.filter(
+                pk=old_group_id).values_list('slug', flat=True).first()
+            generations.bump(generations.group_scope(old_slug))
+        if change:
+            generations.bump_followers(obj.author_id)
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        generations.bump_followers(obj.author_id)
+
+    def delete_queryset(self, request, queryset):
+        author_ids = set(queryset.values_list('author_id', flat=True))
+        super().delete_queryset(request, queryset)
+        for author_id in author_ids:
+            generations.bump_followers(author_id)
+
+
+class CommentAdmin(FullTextSearchMixin, admin.ModelAdmin):
+    list_display = ('pk', 'text', 'created', 'author', 'post',)
+    search_fields = ('text',)
+    list_filter = ('created',)
+    search_subquery = staticmethod(search.matching_comment_ids)
+
+    def recount(self, post_ids):
+        stats.recount_comments(post_ids)
+        for post in Post.objects.filter(
+                pk__in=post_ids).select_related('author', 'group'):
+            generations.bump_post(post)
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change:
+            self.recount({form.initial.get('post'), obj.post_id} - {None})
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        self.recount([obj.post_id])
+
+    def delete_queryset(self, request, queryset):
+        post_ids = set(queryset.values_list('post_id', flat=True))
+        super().delete_queryset(request, queryset)
+        self.recount(post_ids)
+
+
+class GroupAdmin(admin.ModelAdmin):
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        generations.bump(generations.group_scope(obj.slug))
+
+
+class FollowAdmin(admin.ModelAdmin):
+
+    def save_model(self, request, obj, form, change):
+        if change:
+            feed.trim(form.initial['user'], form.initial['author'])
+        super().save_model(request, obj, form, change)
+        feed.backfill(obj.user_id, obj.author_id)
+        generations.bump(generations.profile_scope(obj.author.username))
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        feed.trim(obj.user_id, obj.author_id)
+        generations.bump(generations.profile_scope(obj.author.username))
+
+    def delete_queryset(self, request, queryset):
+        follows = list(queryset.select_related('author'))
+        super().delete_queryset(request, queryset)
+        for follow in follows:
+            feed.trim(follow.user_id, follow.author_id)
+        generations.bump(*{
+            generations.profile_scope(follow.author.username)
+            for follow in follows})
 
 
 admin.site.register(Post, PostAdmin)
-admin.site.register(Group)
-admin.site.register(Comment)
-admin.site.register(Follow)
+admin.site.register(Group, GroupAdmin)
+admin.site.register(Comment, CommentAdmin)
+admin.site.register(Follow, FollowAdmin)
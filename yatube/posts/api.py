@@ -0,0 +1,186 @@
+from functools import wraps
+
+from django.core.files.storage import default_storage
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+
+from . import feed
+from .models import Comment, Group, Post, User
+from .paginators import CursorPaginator
+
+
+API_PAGE_SIZE = 10
+API_MAX_PAGE_SIZE = 100
+
+# Имя поля в ответе -> путь в ORM. Строки читаются через .values(),
+# поэтому из базы выбираются только запрошенные колонки, а объекты
+# моделей не создаются.
+POST_FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'image': 'image',
+    'comments_count': 'comments_count',
+    'last_comment_at': 'last_comment_at',
+}
+COMMENT_FIELDS = {
+    'id': 'id',
+    'post': 'post_id',
+    'author': 'author__username',
+    'text': 'text',
+    'created': 'created',
+}
+GROUP_FIELDS = {
+    'id': 'id',
+    'slug': 'slug',
+    'title': 'title',
+    'description': 'description',
+}
+PROFILE_FIELDS = {
+    'username': 'username',
+    'first_name': 'first_name',
+    'last_name': 'last_name',
+    'posts_count': 'stats__posts_count',
+    'followers_count': 'stats__followers_count',
+    'following_count': 'stats__following_count',
+}
+POST_ORDERING = ('-pub_date', '-id')
+
+
+class BadRequest(Exception):
+    pass
+
+
+def _image_url(name):
+    return default_storage.url(name) if name else None
+
+
+def _count(value):
+    # У пользователя без строки счётчиков join даёт NULL.
+    return value or 0
+
+
+CONVERTERS = {
+    'image': _image_url,
+    'posts_count': _count,
+    'followers_count': _count,
+    'following_count': _count,
+}
+
+
+def _error(message, status=400):
+    return JsonResponse({'error': message}, status=status)
+
+
+def _selected(request, fields):
+    """Поля из параметра fields=; без него отдаются все."""
+    requested = request.GET.get('fields')
+    if not requested:
+        return dict(fields)
+    names = [name.strip() for name in requested.split(',') if name.strip()]
+    unknown = [name for name in names if name not in fields]
+    if unknown:
+        raise BadRequest(f'Неизвестные поля: {", ".join(unknown)}')
+    return {name: fields[name] for name in names}
+
+
+def _page_size(request):
+    try:
+        size = int(request.GET.get('limit', API_PAGE_SIZE))
+    except ValueError:
+        raise BadRequest('limit должен быть числом') from None
+    return max(1, min(size, API_MAX_PAGE_SIZE))
+
+
+def _serialize(row, selected):
+    return {
+        name: CONVERTERS.get(name, lambda value: value)(row[path])
+        for name, path in selected.items()}
+
+
+def _listing(request, queryset, fields, ordering):
+    selected = _selected(request, fields)
+    key_fields = [field.lstrip('-') for field in ordering]
+    rows = queryset.values(*{*selected.values(), *key_fields})
+    page = CursorPaginator(
+        rows, _page_size(request), ordering
+    ).get_page(request.GET.get('cursor'))
+    return JsonResponse({
+        'results': [_serialize(row, selected) for row in page],
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+    })
+
+
+def api_view(view):
+    """Общий GET-обработчик: ошибки запроса отдаются как JSON 400."""
+    @require_GET
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except BadRequest as error:
+            return _error(str(error))
+    return wrapper
+
+
+@api_view
+def posts(request):
+    return _listing(request, Post.objects.all(), POST_FIELDS, POST_ORDERING)
+
+
+@api_view
+def groups(request):
+    return _listing(request, Group.objects.all(), GROUP_FIELDS, ('id',))
+
+
+@api_view
+def group_posts(request, slug):
+    group_id = Group.objects.filter(
+        slug=slug).values_list('id', flat=True).first()
+    if group_id is None:
+        return _error('Группа не найдена', status=404)
+    return _listing(
+        request, Post.objects.filter(group_id=group_id),
+        POST_FIELDS, POST_ORDERING)
+
+
+@api_view
+def profile(request, username):
+    selected = _selected(request, PROFILE_FIELDS)
+    row = User.objects.filter(
+        username=username).values(*selected.values()).first()
+    if row is None:
+        return _error('Пользователь не найден', status=404)
+    return JsonResponse(_serialize(row, selected))
+
+
+@api_view
+def profile_posts(request, username):
+    author_id = User.objects.filter(
+        username=username).values_list('id', flat=True).first()
+    if author_id is None:
+        return _error('Пользователь не найден', status=404)
+    return _listing(
+        request, Post.objects.filter(author_id=author_id),
+        POST_FIELDS, POST_ORDERING)
+
+
+@api_view
+def post_comments(request, post_id):
+    if not Post.objects.filter(pk=post_id).exists():
+        return _error('Пост не найден', status=404)
+    return _listing(
+        request, Comment.objects.filter(post_id=post_id),
+        COMMENT_FIELDS, ('created', 'id'))
+
+
+@api_view
+def follow(request):
+    """Лента подписок; ключ курсора — строка ленты, а не пост."""
+    if not request.user.is_authenticated:
+        return _error('Нужна авторизация', status=401)
+    return _listing(
+        request, feed.posts(request.user), POST_FIELDS, feed.FEED_ORDERING)
@@ -0,0 +1,35 @@
+from django.core.cache import cache
+from django.db.models import F
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+
+CARD_TEMPLATE = 'includes/card_author.html'
+CARD_TIMEOUT = 60 * 60 * 24
+CARD_USER_FIELDS = {'username', 'first_name', 'last_name'}
+
+
+def card_key(post):
+    return f'post_card:{post.id}:{post.version}'
+
+
+def render_cards(posts):
+    """Возвращает HTML карточек, читая кэш одним get_many на страницу."""
+    keys = [card_key(post) for post in posts]
+    cached = cache.get_many(keys)
+    rendered = {}
+    cards = []
+    for key, post in zip(keys, posts):
+        html = cached.get(key)
+        if html is None:
+            html = render_to_string(CARD_TEMPLATE, {'post': post})
+            rendered[key] = html
+        cards.append(mark_safe(html))
+    if rendered:
+        cache.set_many(rendered, CARD_TIMEOUT)
+    return cards
+
+
+def bump_versions(posts):
+    """Сбрасывает кэш карточек одним UPDATE по набору постов."""
+    posts.update(version=F('version') + 1)
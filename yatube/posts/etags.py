@@ -0,0 +1,116 @@
+"""Валидаторы условных GET для post_detail, group_post и profile.
+
+Агрегатов по постам и комментариям здесь нет: всё, что меняет
+страницу, уже отражено в строке объекта (версия поста, счётчики) и в
+поколениях областей кэша (generations), которые переводятся при каждой
+записи. Поэтому валидатор — одна строка по индексу и чтение кэша.
+"""
+import hashlib
+
+from django.db.models import Exists, OuterRef
+
+from . import generations
+from .models import Follow, Group, Post, User
+
+
+def _validators(request, name, load):
+    """Строка, поколения и даты объекта; читаются один раз на запрос.
+
+    condition вызывает etag_func и last_modified_func по отдельности,
+    а считать одно и то же дважды незачем.
+    """
+    memo = request.__dict__.setdefault('_conditional_validators', {})
+    if name not in memo:
+        memo[name] = load()
+    return memo[name]
+
+
+def _etag(request, validators):
+    """Хэш строки-валидатора; None, если объекта нет.
+
+    В хэш входят пользователь и адрес: страница зависит от того, кто её
+    смотрит, и от номера страницы или курсора.
+    """
+    if validators is None:
+        return None
+    row, generation, _ = validators
+    raw = repr((request.user.pk, request.get_full_path(), row, generation))
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def _last_modified(validators):
+    if validators is None:
+        return None
+    _, generation, dates = validators
+    dates = [date for date in (
+        generations.changed_at(generation), *dates) if date is not None]
+    return max(dates) if dates else None
+
+
+def _post_detail(request, post_id):
+    def load():
+        row = Post.objects.filter(pk=post_id).values_list(
+            'id', 'version', 'author__stats__posts_count', 'pub_date',
+            'last_comment_at', 'author__username', 'group__slug',
+        ).first()
+        if row is None:
+            return None
+        scopes = [generations.profile_scope(row[5])]
+        if row[6]:
+            scopes.append(generations.group_scope(row[6]))
+        return row, generations.current(scopes), row[3:5]
+    return _validators(request, 'post_detail', load)
+
+
+def _group(request, slug):
+    def load():
+        row = Group.objects.filter(slug=slug).values_list(
+            'id', 'title', 'description').first()
+        if row is None:
+            return None
+        return row, generations.current(
+            [generations.group_scope(slug)]), ()
+    return _validators(request, 'group', load)
+
+
+def _profile(request, username):
+    def load():
+        row = User.objects.filter(username=username).annotate(
+            followed=Exists(Follow.objects.filter(
+                user=request.user.id, author=OuterRef('pk'))),
+        ).values_list(
+            'id', 'first_name', 'last_name', 'stats__posts_count',
+            'stats__followers_count', 'stats__following_count', 'followed',
+        ).first()
+        if row is None:
+            return None
+        return row, generations.current(
+            [generations.profile_scope(username)]), ()
+    return _validators(request, 'profile', load)
+
+
+def post_detail_etag(request, post_id):
+    """Версия поста, счётчики и поколения автора и группы."""
+    return _etag(request, _post_detail(request, post_id))
+
+
+def post_detail_last_modified(request, post_id):
+    return _last_modified(_post_detail(request, post_id))
+
+
+def group_etag(request, slug):
+    """Строка группы и поколение её списка постов."""
+    return _etag(request, _group(request, slug))
+
+
+def group_last_modified(request, slug):
+    return _last_modified(_group(request, slug))
+
+
+def profile_etag(request, username):
+    """Счётчики автора, подписка читателя и поколение профиля."""
+    return _etag(request, _profile(request, username))
+
+
+def profile_last_modified(request, username):
+    return _last_modified(_profile(request, username))
@@ -0,0 +1,133 @@
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+
+from core.db import write_transaction
+from . import generations
+from .models import FeedEntry, Follow, Post
+
+
+FANOUT_BATCH_SIZE = 1000
+# До стольких подписчиков пост раздаётся прямо в транзакции публикации.
+FANOUT_INLINE_LIMIT = FANOUT_BATCH_SIZE
+# Ключ строки ленты: его порядок совпадает с индексом feed_user_date_idx.
+FEED_ORDERING = ('-feed_date', '-feed_id')
+
+
+def posts(user):
+    """Посты ленты читателя с ключом сортировки строки ленты."""
+    return Post.objects.filter(feed_entries__user=user).annotate(
+        feed_date=F('feed_entries__pub_date'),
+        feed_id=F('feed_entries__id'))
+
+
+def _insert(entries):
+    FeedEntry.objects.bulk_create(
+        entries, batch_size=FANOUT_BATCH_SIZE, ignore_conflicts=True)
+
+
+def fan_out(post):
+    """Раскладывает новый пост по лентам подписчиков автора.
+
+    Небольшую раздачу делает сама транзакция поста. У автора с большим
+    числом подписчиков раздача ждёт COMMIT и идёт пачками, каждая в
+    своей короткой транзакции: блокировка записи SQLite не держится на
+    всё время раздачи, и остальные писатели вклиниваются между пачками.
+    """
+    followers = _followers(post.author_id)
+    first = list(followers[:FANOUT_INLINE_LIMIT + 1])
+    if len(first) <= FANOUT_INLINE_LIMIT:
+        _deliver(post, first)
+        return
+    transaction.on_commit(lambda: _fan_out_batches(post))
+
+
+def _followers(author_id):
+    return Follow.objects.filter(
+        author_id=author_id
+    ).order_by('user_id').values_list('user_id', flat=True)
+
+
+def _fan_out_batches(post):
+    followers = _followers(post.author_id)
+    last_user_id = 0
+    while True:
+        batch = list(
+            followers.filter(user_id__gt=last_user_id)[:FANOUT_BATCH_SIZE])
+        if not batch:
+            break
+        try:
+            _deliver_batch(post, batch)
+        except IntegrityError:
+            # Пост удалили, пока шла раздача: раздавать больше нечего.
+            return
+        last_user_id = batch[-1]
+
+
+def _deliver(post, user_ids):
+    if not user_ids:
+        return
+    _insert([
+        FeedEntry(
+            user_id=user_id,
+            post_id=post.id,
+            author_id=post.author_id,
+            pub_date=post.pub_date)
+        for user_id in user_ids])
+    generations.bump(
+        *[generations.follow_scope(user_id) for user_id in user_ids])
+
+
+_deliver_batch = write_transaction(_deliver)
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту читателя уже опубликованные посты автора."""
+    posts = Post.objects.filter(
+        author_id=author_id
+    ).order_by().values_list('id', 'pub_date')
+    batch = []
+    for post_id, pub_date in posts.iterator(chunk_size=FANOUT_BATCH_SIZE):
+        batch.append(FeedEntry(
+            user_id=user_id,
+            post_id=post_id,
+            author_id=author_id,
+            pub_date=pub_date))
+        if len(batch) == FANOUT_BATCH_SIZE:
+            _insert(batch)
+            batch = []
+    if batch:
+        _insert(batch)
+    generations.bump(generations.follow_scope(user_id))
+
+
+def trim(user_id, author_id):
+    """Убирает из ленты читателя посты автора после отписки."""
+    FeedEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+    generations.bump(generations.follow_scope(user_id))
+
+
+def rebuild(author_ids):
+    """Досоздаёт строки лент по постам авторов одним INSERT ... SELECT.
+
+    Нужна после массовой загрузки: bulk_create не шлёт сигналов, и
+    fan_out для загруженных постов и подписок не вызывается.
+    """
+    ops = connection.ops
+    sql = (
+        f'{ops.insert_statement(ignore_conflicts=True)} '
+        f'{FeedEntry._meta.db_table} (user_id, post_id, author_id, pub_date) '
+        f'SELECT follow.user_id, post.id, post.author_id, post.pub_date '
+        f'FROM {Post._meta.db_table} post '
+        f'JOIN {Follow._meta.db_table} follow '
+        f'ON follow.author_id = post.author_id '
+        f'WHERE post.author_id IN ({{}}) '
+        f'{ops.ignore_conflicts_suffix_sql(ignore_conflicts=True)}')
+    author_ids = list(author_ids)
+    total = 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        for start in range(0, len(author_ids), FANOUT_BATCH_SIZE):
+            batch = author_ids[start:start + FANOUT_BATCH_SIZE]
+            cursor.execute(
+                sql.format(', '.join(['%s'] * len(batch))), batch)
+            total += cursor.rowcount
+    return total
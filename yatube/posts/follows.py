@@ -0,0 +1,98 @@
+import sqlite3
+
+from django.db import connection, transaction
+
+from . import feed, generations, stats, trending
+from .models import Follow, User
+
+
+FOLLOW_BULK_LIMIT = 1000
+
+
+def _supports_returning():
+    if connection.vendor == 'postgresql':
+        return True
+    return (
+        connection.vendor == 'sqlite'
+        and sqlite3.sqlite_version_info >= (3, 35))
+
+
+def _execute(sql, rows):
+    """Выполняет запрос над парами (user_id, author_id).
+
+    Возвращает author_id затронутых строк. Без RETURNING пары идут по
+    одной: rowcount одиночного запроса точно говорит, была ли запись.
+    """
+    values = ', '.join(['(%s, %s)'] * len(rows))
+    params = [value for row in rows for value in row]
+    with connection.cursor() as cursor:
+        if _supports_returning():
+            cursor.execute(
+                sql.format(values=values) + ' RETURNING author_id', params)
+            return [author_id for author_id, in cursor.fetchall()]
+        changed = []
+        for user_id, author_id in rows:
+            cursor.execute(
+                sql.format(values='(%s, %s)'), [user_id, author_id])
+            if cursor.rowcount:
+                changed.append(author_id)
+        return changed
+
+
+def resolve(user, usernames):
+    """Словарь id -> username для авторов; себя и лишнее отбрасывает."""
+    return dict(User.objects.filter(
+        username__in=list(usernames)[:FOLLOW_BULK_LIMIT]
+    ).exclude(pk=user.pk).values_list('id', 'username'))
+
+
+def follow(user, authors):
+    """Подписывает на авторов одним INSERT, игнорирующим дубликаты.
+
+    Повторная подписка ничего не меняет: её отсекает уникальный индекс
+    (user, author), а не предварительная проверка. Счётчики, ленты и
+    поколения кэша обновляются только для реально созданных подписок.
+    """
+    authors = {pk: name for pk, name in authors.items() if pk != user.pk}
+    if not authors:
+        return []
+    ops = connection.ops
+    sql = (
+        f'{ops.insert_statement(ignore_conflicts=True)} '
+        f'{Follow._meta.db_table} (user_id, author_id) VALUES {{values}} '
+        f'{ops.ignore_conflicts_suffix_sql(ignore_conflicts=True)}')
+    with transaction.atomic():
+        created = _execute(sql, [(user.pk, pk) for pk in authors])
+        if created:
+            stats.adjust(user.pk, following_count=len(created))
+        for author_id in created:
+            stats.adjust(author_id, followers_count=1)
+            feed.backfill(user.pk, author_id)
+        trending.record_follows(created)
+    if created:
+        # Профиль подписчика тоже меняется: у него другой счёт подписок.
+        generations.bump(generations.profile_scope(user.username), *[
+            generations.profile_scope(authors[pk]) for pk in created])
+    return [authors[pk] for pk in created]
+
+
+def unfollow(user, authors):
+    """Отписывает от авторов одним DELETE; лишние отписки не ошибка."""
+    authors = {pk: name for pk, name in authors.items() if pk != user.pk}
+    if not authors:
+        return []
+    sql = (
+        f'DELETE FROM {Follow._meta.db_table} '
+        f'WHERE (user_id, author_id) IN (VALUES {{values}})')
+    with transaction.atomic():
+        removed = _execute(sql, [(user.pk, pk) for pk in authors])
+        if removed:
+            stats.adjust(user.pk, following_count=-len(removed))
+        for author_id in removed:
+            stats.adjust(author_id, followers_count=-1)
+            feed.trim(user.pk, author_id)
+    if removed:
+        # Профиль подписчика тоже меняется: у него другой счёт подписок.
+        generations.bump(generations.profile_scope(user.username), *[
+            generations.profile_scope(authors[pk]) for pk in removed])
+    return [authors[pk] for pk in removed]
@@ -1,5 +1,7 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 
+from posts.images import normalize_image
 from posts.models import Post, Comment
 
 
@@ -18,6 +20,12 @@ class PostForm(forms.ModelForm):
             'image': 'Выберите файл с изображением'
         }
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if isinstance(image, UploadedFile):
+            return normalize_image(image)
+        return image
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
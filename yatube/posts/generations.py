@@ -0,0 +1,207 @@
+import math
+import random
+import uuid
+from datetime import datetime, timezone
+from functools import wraps
+from time import perf_counter, time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import (
+    get_cache_key, has_vary_header, learn_cache_key)
+
+from .models import Follow
+
+
+# Жёсткий срок: дольше копия страницы в кэше не живёт вообще.
+LISTING_CACHE_TIMEOUT = 60 * 60 * 6
+# Мягкий срок: после него копия ещё отдаётся, но её пересчитывают.
+LISTING_SOFT_TIMEOUT = 60 * 15
+# Сколько держится блокировка пересчёта, если воркер упал на полпути.
+LISTING_LOCK_TIMEOUT = 30
+# Параметр XFetch: чем больше, тем раньше начинается пересчёт.
+LISTING_EARLY_BETA = 1.0
+LISTING_KEY_PREFIX = 'listing'
+BUMP_BATCH_SIZE = 1000
+
+
+def index_scope():
+    return 'index'
+
+
+def group_scope(slug):
+    return f'group:{slug}'
+
+
+def profile_scope(username):
+    return f'profile:{username}'
+
+
+def follow_scope(user_id):
+    return f'follow:{user_id}'
+
+
+def _key(scope):
+    return f'generation:{scope}'
+
+
+def _token():
+    # Время в начале токена даёт страницам Last-Modified.
+    return f'{int(time())}-{uuid.uuid4().hex}'
+
+
+def current(scopes):
+    """Текущие поколения областей; отсутствующие заводятся заново."""
+    keys = [_key(scope) for scope in scopes]
+    values = cache.get_many(keys)
+    for key in keys:
+        if key not in values:
+            cache.add(key, _token(), None)
+            values[key] = cache.get(key)
+    return ':'.join(str(values[key]) for key in keys)
+
+
+def changed_at(generation):
+    """Время последней смены поколений из строки current(), UTC."""
+    stamps = []
+    for token in generation.split(':'):
+        try:
+            stamps.append(int(token.split('-', 1)[0]))
+        except ValueError:
+            # Токен старого формата, без времени.
+            continue
+    if not stamps:
+        return None
+    return datetime.fromtimestamp(max(stamps), tz=timezone.utc)
+
+
+def bump(*scopes):
+    """Переводит области на новое поколение: старые страницы недостижимы.
+
+    Внутри транзакции поколения сменятся ещё раз после COMMIT: читатель,
+    успевший до него закэшировать прежние строки под новым поколением,
+    не оставит эту копию жить дальше.
+    """
+    if not scopes:
+        return
+
+    def renew():
+        cache.set_many({_key(scope): _token() for scope in scopes}, None)
+
+    renew()
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(renew)
+
+
+def bump_followers(author_id):
+    """Сбрасывает ленты всех подписчиков автора пачками."""
+    followers = Follow.objects.filter(
+        author_id=author_id
+    ).order_by('user_id').values_list('user_id', flat=True)
+    last_user_id = 0
+    while True:
+        batch = list(
+            followers.filter(user_id__gt=last_user_id)[:BUMP_BATCH_SIZE])
+        if not batch:
+            break
+        bump(*[follow_scope(user_id) for user_id in batch])
+        last_user_id = batch[-1]
+
+
+def bump_post(post):
+    """Сбрасывает общие списки с постом; ленты подписчиков — отдельно."""
+    scopes = [index_scope(), profile_scope(post.author.username)]
+    if post.group_id:
+        scopes.append(group_scope(post.group.slug))
+    bump(*scopes)
+
+
+class CachedPage:
+    """Копия ответа с поколением и сроками, после которых её пересчитать."""
+
+    def __init__(self, response, generation, delta):
+        self.response = response
+        self.generation = generation
+        self.delta = delta
+        self.soft_expires = time() + LISTING_SOFT_TIMEOUT
+
+    def is_fresh(self, generation):
+        """Вероятностный ранний пересчёт XFetch.
+
+        Чем дольше считалась страница (delta) и чем ближе мягкий срок,
+        тем вероятнее, что запрос пересчитает её заранее. Так копии в
+        разных воркерах не истекают одновременно.
+        """
+        if self.generation != generation:
+            return False
+        early = -self.delta * LISTING_EARLY_BETA * math.log(
+            1 - random.random())
+        return time() + early < self.soft_expires
+
+
+def _should_store(request, response):
+    # Те же условия, что у UpdateCacheMiddleware.
+    if response.streaming or response.status_code != 200:
+        return False
+    if (not request.COOKIES and response.cookies
+            and has_vary_header(response, 'Cookie')):
+        return False
+    return 'private' not in response.get('Cache-Control', ())
+
+
+def _store(request, response, prefix, generation, delta):
+    if not _should_store(request, response):
+        return
+    key = learn_cache_key(
+        request, response, LISTING_CACHE_TIMEOUT, prefix, cache=cache)
+
+    def save(response):
+        cache.set(
+            key, CachedPage(response, generation, delta),
+            LISTING_CACHE_TIMEOUT)
+
+    if hasattr(response, 'render') and callable(response.render):
+        response.add_post_render_callback(save)
+    else:
+        save(response)
+
+
+def cache_generation(get_scopes):
+    """Кэширует страницу и помечает копию поколениями её областей.
+
+    Страница живёт в кэше часами и всё равно не устаревает: запись
+    переводит область на новое поколение, и копия прежнего поколения
+    считается просроченной. Просроченную копию пересчитывает один
+    запрос — тот, кто взял блокировку; остальные в это время получают
+    старую копию и не бьют в базу все разом.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            scopes = get_scopes(request, *args, **kwargs)
+            generation = current(scopes)
+            # Области входят в ключ: у каждого читателя своя лента.
+            prefix = ':'.join([LISTING_KEY_PREFIX, *scopes])
+            key = get_cache_key(request, prefix, 'GET', cache=cache)
+            page = cache.get(key) if key else None
+            if page is not None and page.is_fresh(generation):
+                return page.response
+            lock = f'{key}:lock'
+            locked = key is not None and cache.add(
+                lock, 1, LISTING_LOCK_TIMEOUT)
+            if page is not None and not locked:
+                return page.response
+            try:
+                started = perf_counter()
+                response = view(request, *args, **kwargs)
+                _store(
+                    request, response, prefix, generation,
+                    perf_counter() - started)
+            finally:
+                if locked:
+                    cache.delete(lock)
+            return response
+        return wrapper
+    return decorator
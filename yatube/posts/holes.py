@@ -0,0 +1,42 @@
+"""Личные фрагменты страниц posts; см. core.holes."""
+from core.holes import register
+
+from . import suggestions
+from .forms import CommentForm
+from .models import Follow
+
+
+@register('switcher', 'includes/switcher.html')
+def switcher(request):
+    return {}
+
+
+@register('follow_button', 'includes/follow_button.html')
+def follow_button(request, author):
+    user = request.user
+    show = user.is_authenticated and user.username != author
+    return {
+        'author': author,
+        'show': show,
+        'following': show and Follow.objects.filter(
+            user=user, author__username=author).exists(),
+    }
+
+
+@register('post_edit_link', 'includes/post_edit_link.html')
+def post_edit_link(request, post_id, author_id):
+    return {'post_id': post_id, 'author_id': author_id}
+
+
+@register('comment_form', 'includes/comment_form.html')
+def comment_form(request, post_id):
+    return {'form': CommentForm(), 'post_id': post_id}
+
+
+@register('follow_suggestions', 'includes/suggestions.html')
+def follow_suggestions(request):
+    user = request.user
+    return {
+        'suggestions': (
+            suggestions.for_user(user) if user.is_authenticated else []),
+    }
@@ -0,0 +1,52 @@
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image, ImageOps
+
+
+EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'WEBP': 'webp'}
+
+
+def normalize_image(upload):
+    """Уменьшает, очищает от метаданных и перекодирует загруженный файл.
+
+    Размеры читаются из заголовка до декодирования, так что
+    «бомбы декомпрессии» отклоняются до того, как займут память.
+    """
+    max_side = settings.POST_IMAGE_MAX_SIDE
+    image_format = settings.POST_IMAGE_FORMAT
+    upload.seek(0)
+    try:
+        with Image.open(upload) as image:
+            if image.width * image.height > settings.POST_IMAGE_MAX_PIXELS:
+                raise ValidationError(
+                    'Изображение слишком большое', code='image_too_large')
+            image.draft('RGB', (max_side, max_side))
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((max_side, max_side), Image.LANCZOS)
+            if image_format == 'JPEG' and image.mode != 'RGB':
+                image = _flatten(image)
+            output = BytesIO()
+            image.save(
+                output,
+                image_format,
+                quality=settings.POST_IMAGE_QUALITY,
+                optimize=True)
+    except (Image.DecompressionBombError, OSError, SyntaxError):
+        raise ValidationError(
+            'Не удалось обработать изображение', code='invalid_image')
+    name = '{}.{}'.format(
+        os.path.splitext(os.path.basename(upload.name))[0],
+        EXTENSIONS.get(image_format, image_format.lower()))
+    return SimpleUploadedFile(
+        name, output.getvalue(), Image.MIME.get(image_format))
+
+
+def _flatten(image):
+    image = image.convert('RGBA')
+    background = Image.new('RGB', image.size, (255, 255, 255))
+    background.paste(image, mask=image.getchannel('A'))
+    return background
@@ -0,0 +1,285 @@
+import csv
+import json
+from contextlib import contextmanager
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import feed, generations, stats
+from .models import Comment, Follow, Group, Post, User
+
+
+IMPORT_BATCH_SIZE = 1000
+FORMATS = ('ndjson', 'csv')
+MODELS = {
+    'groups': Group,
+    'posts': Post,
+    'comments': Comment,
+    'follows': Follow,
+}
+# Поля с auto_now_add, значения которых берутся из архива.
+DATE_FIELDS = {
+    'posts': 'pub_date',
+    'comments': 'created',
+}
+
+
+def read_rows(stream, fmt):
+    """Построчно читает NDJSON или CSV, не загружая файл в память.
+
+    Битая строка NDJSON отдаётся как исключение, чтобы загрузчик мог
+    пропустить её и продолжить.
+    """
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as error:
+            yield error
+
+
+def _parse_date(value):
+    if not value:
+        return timezone.now()
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValueError(f'Неверная дата: {value}')
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, timezone.utc)
+    return parsed
+
+
+@contextmanager
+def _keep_dates(model, field_name):
+    """Отключает auto_now_add, чтобы сохранить даты из архива."""
+    if field_name is None:
+        yield
+        return
+    field = model._meta.get_field(field_name)
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+def _chunks(items, size):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class Importer:
+    """Загружает архив пачками через bulk_create.
+
+    Авторы и группы ищутся в словарях, прочитанных один раз перед
+    загрузкой; каждая пачка пишется в своей транзакции. bulk_create не
+    шлёт сигналов, поэтому счётчики, ленты и поколения кэша
+    обновляются один раз в finish().
+    """
+
+    def __init__(self, kind, batch_size=IMPORT_BATCH_SIZE,
+                 create_authors=False):
+        if kind not in MODELS:
+            raise ValueError(f'Неизвестный тип записей: {kind}')
+        self.kind = kind
+        self.batch_size = batch_size
+        self.create_authors = create_authors
+        self.users = dict(User.objects.values_list('username', 'id'))
+        self.groups = dict(Group.objects.values_list('slug', 'id'))
+        self.created = 0
+        self.skipped = 0
+        self.touched_users = set()
+        self.touched_groups = set()
+        self.touched_posts = set()
+
+    def run(self, rows, on_error=None):
+        # Записанные пачки уже в базе: их счётчики и кэш чинятся, даже
+        # если следующая пачка упала.
+        try:
+            self._load(rows, on_error)
+        finally:
+            self.finish()
+        return self.created
+
+    def _load(self, rows, on_error):
+        build = getattr(self, f'build_{self.kind}')
+        batch = []
+        for number, row in enumerate(rows, 1):
+            try:
+                if isinstance(row, Exception):
+                    raise row
+                batch.append(build(row))
+            except (KeyError, TypeError, ValueError, ValidationError) as error:
+                self.skipped += 1
+                if on_error is not None:
+                    on_error(number, error)
+                continue
+            if len(batch) == self.batch_size:
+                self.flush(batch)
+                batch = []
+        if batch:
+            self.flush(batch)
+
+    def user_id(self, username):
+        if not username:
+            raise ValueError('Не указан пользователь')
+        if username not in self.users:
+            if not self.create_authors:
+                raise ValueError(f'Нет пользователя {username}')
+            self.users[username] = User.objects.create_user(username).id
+        return self.users[username]
+
+    def group_id(self, slug):
+        if not slug:
+            return None
+        try:
+            return self.groups[slug]
+        except KeyError:
+            raise ValueError(f'Нет группы {slug}') from None
+
+    def build_groups(self, row):
+        group = Group(
+            slug=row['slug'],
+            title=row['title'],
+            description=row.get('description') or '')
+        group.full_clean(validate_unique=False)
+        return group
+
+    def build_posts(self, row):
+        if not row.get('text'):
+            raise ValueError('Пустой текст поста')
+        post = Post(
+            text=row['text'],
+            author_id=self.user_id(row.get('author')),
+            group_id=self.group_id(row.get('group')),
+            pub_date=_parse_date(row.get('pub_date')),
+            image=row.get('image') or '')
+        if row.get('id'):
+            post.id = int(row['id'])
+        return post
+
+    def build_comments(self, row):
+        if not row.get('text'):
+            raise ValueError('Пустой текст комментария')
+        return Comment(
+            post_id=int(row['post']),
+            author_id=self.user_id(row.get('author')),
+            text=row['text'],
+            created=_parse_date(row.get('created')))
+
+    def build_follows(self, row):
+        user_id = self.user_id(row.get('user'))
+        author_id = self.user_id(row.get('author'))
+        if user_id == author_id:
+            raise ValueError('Нельзя подписаться на себя')
+        return Follow(user_id=user_id, author_id=author_id)
+
+    def flush(self, batch):
+        model = MODELS[self.kind]
+        with transaction.atomic():
+            batch = getattr(self, f'_filter_{self.kind}', list)(batch)
+            with _keep_dates(model, DATE_FIELDS.get(self.kind)):
+                model.objects.bulk_create(batch)
+        self.created += len(batch)
+        self._touch(batch)
+
+    def _filter_posts(self, batch):
+        existing = set(Post.objects.filter(
+            id__in={post.id for post in batch if post.id is not None}
+        ).values_list('id', flat=True))
+        kept = []
+        for post in batch:
+            if post.id is None:
+                kept.append(post)
+            elif post.id not in existing:
+                # Повтор id внутри пачки — тоже дубликат.
+                existing.add(post.id)
+                kept.append(post)
+        self.skipped += len(batch) - len(kept)
+        return kept
+
+    def _filter_comments(self, batch):
+        existing = set(Post.objects.filter(
+            id__in={comment.post_id for comment in batch}
+        ).values_list('id', flat=True))
+        kept = [comment for comment in batch if comment.post_id in existing]
+        self.skipped += len(batch) - len(kept)
+        return kept
+
+    def _filter_groups(self, batch):
+        kept = {}
+        for group in batch:
+            if group.slug not in self.groups:
+                kept.setdefault(group.slug, group)
+        self.skipped += len(batch) - len(kept)
+        return list(kept.values())
+
+    def _filter_follows(self, batch):
+        existing = set(Follow.objects.filter(
+            user_id__in={follow.user_id for follow in batch},
+            author_id__in={follow.author_id for follow in batch},
+        ).values_list('user_id', 'author_id'))
+        kept = {}
+        for follow in batch:
+            pair = (follow.user_id, follow.author_id)
+            if pair not in existing:
+                kept.setdefault(pair, follow)
+        self.skipped += len(batch) - len(kept)
+        return list(kept.values())
+
+    def _touch(self, batch):
+        if self.kind == 'groups':
+            self.groups.update(Group.objects.filter(
+                slug__in=[group.slug for group in batch]
+            ).values_list('slug', 'id'))
+        elif self.kind == 'posts':
+            for post in batch:
+                self.touched_users.add(post.author_id)
+                if post.group_id:
+                    self.touched_groups.add(post.group_id)
+        elif self.kind == 'follows':
+            for follow in batch:
+                self.touched_users.update((follow.user_id, follow.author_id))
+        elif self.kind == 'comments':
+            self.touched_posts.update(comment.post_id for comment in batch)
+
+    def finish(self):
+        """Обновляет то, что при обычном сохранении делают сигналы."""
+        if self.kind == 'comments':
+            self.finish_comments()
+        if self.kind not in ('posts', 'follows'):
+            return
+        for slugs in _chunks(self.touched_groups, self.batch_size):
+            generations.bump(*[
+                generations.group_scope(slug)
+                for slug in Group.objects.filter(
+                    id__in=slugs).values_list('slug', flat=True)])
+        generations.bump(generations.index_scope())
+        for user_ids in _chunks(sorted(self.touched_users), self.batch_size):
+            stats.recompute(user_ids)
+            feed.rebuild(user_ids)
+            usernames = User.objects.filter(
+                id__in=user_ids).values_list('username', flat=True)
+            generations.bump(
+                *[generations.profile_scope(name) for name in usernames],
+                *[generations.follow_scope(user_id) for user_id in user_ids])
+            for author_id in user_ids:
+                generations.bump_followers(author_id)
+
+    def finish_comments(self):
+        for post_ids in _chunks(sorted(self.touched_posts), self.batch_size):
+            stats.recount_comments(post_ids)
+            rows = Post.objects.filter(pk__in=post_ids).values_list(
+                'author__username', 'group__slug').distinct()
+            generations.bump(
+                generations.index_scope(),
+                *{generations.profile_scope(name) for name, _ in rows},
+                *{generations.group_scope(slug) for _, slug in rows if slug})
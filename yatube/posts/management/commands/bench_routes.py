@@ -0,0 +1,172 @@
+import json
+import math
+from time import perf_counter
+from urllib.parse import urlencode
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from posts import generations, urls
+from posts.models import Follow, Group, Post
+
+
+User = get_user_model()
+
+# Маршруты, которые меняют данные.
+MUTATING_ROUTES = {
+    'add_comment', 'profile_follow', 'profile_unfollow', 'follow_bulk'}
+# Маршруты, которые открывает только автор поста.
+AUTHOR_ROUTES = {'post_edit'}
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(values, rank):
+    """Перцентиль по методу ближайшего ранга; values отсортированы."""
+    index = max(0, math.ceil(rank / 100 * len(values)) - 1)
+    return values[index]
+
+
+class Command(BaseCommand):
+    help = ('Прогоняет GET-запросы по маршрутам posts.urls через тестовый '
+            'клиент и пишет перцентили задержки и число запросов в JSON.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=50,
+            help='Сколько замеров делать на маршрут.')
+        parser.add_argument(
+            '--warmup', type=int, default=5,
+            help='Сколько запросов сделать до замеров.')
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Сбрасывать кэш страниц перед каждым запросом. Кэш '
+                 'целиком не чистится: в нём живут сессии и страницы сайта.')
+        parser.add_argument(
+            '--user', help='От чьего имени ходить; по умолчанию — '
+                           'пользователь с наибольшим числом подписок.')
+        parser.add_argument('--output', help='Файл для результатов JSON.')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1:
+            raise CommandError('Нужен хотя бы один замер')
+        client = Client()
+        user = self.reader(options['user'])
+        if user is not None:
+            client.force_login(user)
+        samples = self.samples()
+        options['scopes'] = self.scopes(samples, user)
+        author_client = Client()
+        author_client.force_login(samples.pop('post_author'))
+        results = {}
+        for name, address in self.addresses(samples).items():
+            results[name] = self.measure(
+                author_client if name in AUTHOR_ROUTES else client,
+                address, options)
+            self.stdout.write(
+                f'{name:<22} p50={results[name]["p50_ms"]:>8.2f} мс '
+                f'p95={results[name]["p95_ms"]:>8.2f} мс '
+                f'p99={results[name]["p99_ms"]:>8.2f} мс '
+                f'запросов={results[name]["queries_per_request"]:.1f}')
+        report = {
+            'started': timezone.now().isoformat(),
+            'requests': options['requests'],
+            'cold': options['cold'],
+            'user': user.username if user else None,
+            'rows': {
+                'posts': Post.objects.count(),
+                'groups': Group.objects.count(),
+                'follows': Follow.objects.count(),
+            },
+            'routes': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as stream:
+                json.dump(report, stream, ensure_ascii=False, indent=2)
+
+    def reader(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f'Нет пользователя {username}') from None
+        return User.objects.annotate(
+            total=Count('follower')).order_by('-total', 'pk').first()
+
+    def samples(self):
+        """Самые тяжёлые объекты: большая группа, знаменитость, пост."""
+        group = Group.objects.annotate(
+            total=Count('groups')).order_by('-total', 'pk').first()
+        author = User.objects.annotate(
+            total=Count('posts')).order_by('-total', 'pk').first()
+        post = Post.objects.select_related('author').annotate(
+            total=Count('comments')).order_by('-total', 'pk').first()
+        if not (group and author and post):
+            raise CommandError('База пуста: сначала запустите seed_data')
+        return {
+            'slug': group.slug,
+            'username': author.username,
+            'post_id': post.id,
+            'post_author': post.author,
+        }
+
+    def scopes(self, samples, user):
+        """Области кэша страниц, которые открывает прогон."""
+        scopes = [
+            generations.index_scope(),
+            generations.group_scope(samples['slug']),
+            generations.profile_scope(samples['username']),
+            generations.profile_scope(samples['post_author'].username),
+        ]
+        post_group = Post.objects.filter(
+            pk=samples['post_id']).values_list('group__slug', flat=True)[0]
+        if post_group:
+            scopes.append(generations.group_scope(post_group))
+        if user is not None:
+            scopes.append(generations.follow_scope(user.pk))
+        return scopes
+
+    def addresses(self, samples):
+        query = Post.objects.get(pk=samples['post_id']).text.split()[0]
+        addresses = {}
+        for pattern in urls.urlpatterns:
+            if pattern.name in MUTATING_ROUTES:
+                continue
+            kwargs = {
+                key: samples[key] for key in pattern.pattern.converters}
+            address = reverse(f'{urls.app_name}:{pattern.name}', kwargs=kwargs)
+            if pattern.name == 'search':
+                address += '?' + urlencode({'q': query})
+            addresses[pattern.name] = address
+        return addresses
+
+    def measure(self, client, address, options):
+        for _ in range(options['warmup']):
+            client.get(address)
+        timings = []
+        queries = 0
+        status = None
+        for _ in range(options['requests']):
+            if options['cold']:
+                generations.bump(*options['scopes'])
+            with CaptureQueriesContext(connection) as captured:
+                started = perf_counter()
+                response = client.get(address)
+                timings.append((perf_counter() - started) * 1000)
+            queries += len(captured)
+            status = response.status_code
+        timings.sort()
+        result = {
+            'path': address,
+            'status': status,
+            'mean_ms': sum(timings) / len(timings),
+            'queries_per_request': queries / options['requests'],
+        }
+        for rank in PERCENTILES:
+            result[f'p{rank}_ms'] = percentile(timings, rank)
+        return result
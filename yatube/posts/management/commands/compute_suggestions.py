@@ -0,0 +1,28 @@
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import suggestions
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает подсказки «кого почитать» по графу подписок. '
+            'Запускать периодически, например раз в сутки.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--per-user', type=int, default=suggestions.SUGGESTIONS_PER_USER,
+            help='Сколько подсказок хранить на пользователя.')
+        parser.add_argument(
+            '--chunk-size', type=int,
+            default=suggestions.SUGGESTIONS_CHUNK_SIZE,
+            help='Сколько читателей считать за одно умножение матриц.')
+
+    def handle(self, *args, **options):
+        if options['per_user'] < 1 or options['chunk_size'] < 1:
+            raise CommandError('Размеры должны быть положительными')
+        started = perf_counter()
+        total = suggestions.compute(
+            options['per_user'], options['chunk_size'])
+        self.stdout.write(
+            f'Подсказок: {total} за {perf_counter() - started:.1f} с')
@@ -0,0 +1,61 @@
+import os
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import importer
+
+
+class Command(BaseCommand):
+    help = 'Потоково загружает группы, посты, комментарии или подписки.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=list(importer.MODELS))
+        parser.add_argument(
+            'path', help='Файл NDJSON или CSV; «-» — стандартный ввод.')
+        parser.add_argument(
+            '--format', choices=importer.FORMATS,
+            help='Формат входа; по умолчанию — по расширению файла.')
+        parser.add_argument(
+            '--batch-size', type=int, default=importer.IMPORT_BATCH_SIZE,
+            help='Сколько строк вставлять за одну транзакцию.')
+        parser.add_argument(
+            '--create-authors', action='store_true',
+            help='Заводить неизвестных пользователей.')
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        path = options['path']
+        fmt = options['format']
+        if fmt is None:
+            extension = os.path.splitext(path)[1].lstrip('.').lower()
+            fmt = 'csv' if extension == 'csv' else 'ndjson'
+        if options['batch_size'] < 1:
+            raise CommandError('Размер пачки должен быть положительным')
+        loader = importer.Importer(
+            options['kind'],
+            batch_size=options['batch_size'],
+            create_authors=options['create_authors'])
+        started = time.monotonic()
+        if path == '-':
+            self.load(loader, sys.stdin, fmt)
+        else:
+            try:
+                stream = open(path, newline='', encoding='utf-8')
+            except OSError as error:
+                raise CommandError(error)
+            with stream:
+                self.load(loader, stream, fmt)
+        elapsed = time.monotonic() - started
+        rate = loader.created / elapsed if elapsed else 0
+        self.stdout.write(
+            f'Загружено: {loader.created}, пропущено: {loader.skipped} '
+            f'за {elapsed:.1f} с ({rate:.0f} строк/с)')
+
+    def load(self, loader, stream, fmt):
+        loader.run(importer.read_rows(stream, fmt), on_error=self.report)
+
+    def report(self, number, error):
+        if self.verbosity > 0:
+            self.stderr.write(f'Строка {number}: {error}')
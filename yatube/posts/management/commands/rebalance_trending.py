@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from posts import trending
+
+
+class Command(BaseCommand):
+    help = ('Переносит эпоху популярных постов на текущий момент и '
+            'отбрасывает затухшие очки. Запускать периодически, '
+            'например раз в час.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild', action='store_true',
+            help='Пересчитать очки заново по комментариям окна; вклад '
+                 'подписок при этом теряется.')
+
+    def handle(self, *args, **options):
+        total = trending.rebalance(rebuild=options['rebuild'])
+        self.stdout.write(f'Постов в рейтинге: {total}')
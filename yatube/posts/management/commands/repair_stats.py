@@ -0,0 +1,41 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from posts import stats
+from posts.models import Post
+
+
+User = get_user_model()
+
+
+def pk_chunks(queryset, size):
+    """Первичные ключи пачками по возрастанию."""
+    pks = queryset.order_by('pk').values_list('pk', flat=True)
+    last_pk = 0
+    while True:
+        chunk = list(pks.filter(pk__gt=last_pk)[:size])
+        if not chunk:
+            return
+        yield chunk
+        last_pk = chunk[-1]
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает счётчики постов, подписчиков, подписок '
+            'и комментариев.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='Сколько пользователей или постов пересчитывать за проход.')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        total = 0
+        for user_ids in pk_chunks(User.objects.all(), chunk_size):
+            total += stats.recompute(user_ids)
+        self.stdout.write(f'Пересчитано пользователей: {total}')
+        total = 0
+        for post_ids in pk_chunks(Post.objects.all(), chunk_size):
+            total += stats.recount_comments(post_ids)
+        self.stdout.write(f'Пересчитано постов: {total}')
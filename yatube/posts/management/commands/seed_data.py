@@ -0,0 +1,154 @@
+import random
+from datetime import timedelta
+from io import BytesIO
+from itertools import accumulate
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from faker import Faker
+from PIL import Image
+
+from posts import importer
+from posts.models import Group, Post
+
+
+User = get_user_model()
+
+# Показатель распределения Ципфа: чем больше, тем сильнее перекос
+# в пользу первых авторов и групп.
+DEFAULT_SKEW = 1.1
+SEED_IMAGES = 8
+SEED_DAYS = 365
+
+
+def zipf_weights(size, skew):
+    """Накопленные веса: i-й элемент выбирается с весом 1 / (i + 1)^skew."""
+    return list(accumulate(1 / (rank + 1) ** skew for rank in range(size)))
+
+
+class Command(BaseCommand):
+    help = ('Заполняет базу синтетическими пользователями, группами, '
+            'постами, комментариями и подписками.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--groups', type=int, default=10)
+        parser.add_argument('--posts', type=int, default=1000)
+        parser.add_argument('--comments', type=int, default=2000)
+        parser.add_argument('--follows', type=int, default=1000)
+        parser.add_argument(
+            '--images', type=float, default=0.1,
+            help='Доля постов с картинкой.')
+        parser.add_argument(
+            '--skew', type=float, default=DEFAULT_SKEW,
+            help='Перекос распределения: знаменитые авторы, большие группы.')
+        parser.add_argument(
+            '--seed', type=int, help='Зерно для воспроизводимых данных.')
+        parser.add_argument(
+            '--batch-size', type=int, default=importer.IMPORT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        if options['users'] < 2:
+            raise CommandError('Нужно хотя бы два пользователя')
+        self.random = random.Random(options['seed'])
+        self.fake = Faker('ru_RU')
+        self.fake.seed_instance(options['seed'])
+        self.skew = options['skew']
+        self.batch_size = options['batch_size']
+        usernames = self.seed_users(options['users'])
+        slugs = self.seed_groups(options['groups'])
+        self.load('follows', self.follow_rows(usernames, options['follows']))
+        images = self.seed_images() if options['images'] > 0 else []
+        self.load('posts', self.post_rows(
+            usernames, slugs, images, options['posts'], options['images']))
+        self.load('comments', self.comment_rows(
+            usernames, options['comments']))
+
+    def load(self, kind, rows):
+        loader = importer.Importer(kind, batch_size=self.batch_size)
+        loader.run(rows)
+        self.stdout.write(f'{kind}: {loader.created}')
+
+    def pick(self, items, weights):
+        return self.random.choices(items, cum_weights=weights)[0]
+
+    def seed_users(self, count):
+        start = User.objects.count()
+        users = []
+        for index in range(start, start + count):
+            user = User(
+                username=f'{self.fake.user_name()}_{index}',
+                first_name=self.fake.first_name(),
+                last_name=self.fake.last_name())
+            user.set_unusable_password()
+            users.append(user)
+        User.objects.bulk_create(
+            users, batch_size=self.batch_size, ignore_conflicts=True)
+        self.stdout.write(f'users: {len(users)}')
+        return [user.username for user in users]
+
+    def seed_groups(self, count):
+        start = Group.objects.count()
+        rows = [
+            {
+                'slug': f'group-{index}',
+                'title': self.fake.catch_phrase()[:200],
+                'description': self.fake.paragraph(),
+            }
+            for index in range(start, start + count)]
+        self.load('groups', rows)
+        return [row['slug'] for row in rows]
+
+    def seed_images(self):
+        names = []
+        for index in range(SEED_IMAGES):
+            color = tuple(self.random.randrange(256) for _ in range(3))
+            buffer = BytesIO()
+            Image.new('RGB', (960, 540), color).save(buffer, 'JPEG')
+            names.append(default_storage.save(
+                f'posts/seed_{index}.jpg', ContentFile(buffer.getvalue())))
+        return names
+
+    def follow_rows(self, usernames, count):
+        weights = zipf_weights(len(usernames), self.skew)
+        for _ in range(count):
+            user = self.random.choice(usernames)
+            author = self.pick(usernames, weights)
+            if user != author:
+                yield {'user': user, 'author': author}
+
+    def post_rows(self, usernames, slugs, images, count, image_share):
+        authors = zipf_weights(len(usernames), self.skew)
+        groups = zipf_weights(len(slugs), self.skew)
+        now = timezone.now()
+        for _ in range(count):
+            yield {
+                'author': self.pick(usernames, authors),
+                'group': (
+                    self.pick(slugs, groups)
+                    if slugs and self.random.random() < 0.7 else None),
+                'text': self.fake.paragraph(nb_sentences=5),
+                'pub_date': (now - timedelta(
+                    seconds=self.random.randrange(SEED_DAYS * 86400))
+                ).isoformat(),
+                'image': (
+                    self.random.choice(images)
+                    if images and self.random.random() < image_share
+                    else None),
+            }
+
+    def comment_rows(self, usernames, count):
+        post_ids = list(Post.objects.order_by('-pub_date').values_list(
+            'id', flat=True)[:count or 1])
+        if not post_ids:
+            return
+        weights = zipf_weights(len(post_ids), self.skew)
+        for _ in range(count):
+            yield {
+                'post': self.pick(post_ids, weights),
+                'author': self.random.choice(usernames),
+                'text': self.fake.sentence(),
+            }
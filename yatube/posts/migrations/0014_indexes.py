@@ -0,0 +1,57 @@
+# Generated by Django 2.2.16 on 2026-10-18 17:04
+
+from django.db import migrations, models
+from django.db.models import Count, F, Min, Value
+from django.db.models.functions import Greatest
+
+
+def dedupe_follows(apps, schema_editor):
+    Follow = apps.get_model('posts', 'Follow')
+    AuthorStats = apps.get_model('posts', 'AuthorStats')
+    duplicates = Follow.objects.order_by().values(
+        'user_id', 'author_id'
+    ).annotate(keep=Min('pk'), total=Count('pk')).filter(total__gt=1)
+    for row in duplicates.iterator():
+        Follow.objects.filter(
+            user_id=row['user_id'], author_id=row['author_id']
+        ).exclude(pk=row['keep']).delete()
+        extra = row['total'] - 1
+        AuthorStats.objects.filter(user_id=row['author_id']).update(
+            followers_count=Greatest(F('followers_count') - extra, Value(0)))
+        AuthorStats.objects.filter(user_id=row['user_id']).update(
+            following_count=Greatest(F('following_count') - extra, Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'created'], name='comment_post_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='follow',
+            index=models.Index(fields=['author', 'user'], name='follow_author_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['pub_date'], name='post_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', 'pub_date'], name='post_author_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['group', 'pub_date'], name='post_group_date_idx'),
+        ),
+        migrations.RunPython(dedupe_follows, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='unique_follow'),
+        ),
+    ]
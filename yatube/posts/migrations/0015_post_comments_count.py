@@ -0,0 +1,56 @@
+# Generated by Django 2.2.16 on 2026-10-18 17:12
+
+from importlib import import_module
+
+from django.db import migrations, models
+from django.db.models import Count, Max, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_comments_count(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    comments = Comment.objects.filter(
+        post=OuterRef('pk')).order_by().values('post')
+    Post.objects.update(
+        comments_count=Coalesce(
+            Subquery(comments.annotate(total=Count('pk')).values('total')),
+            Value(0)),
+        last_comment_at=Subquery(
+            comments.annotate(last=Max('created')).values('last')))
+
+
+# AddField в SQLite пересоздаёт таблицу posts_post, и триггеры индекса
+# FTS5 из 0013_search пропадают: ставим их заново в обе стороны.
+search = import_module('posts.migrations.0013_search')
+POST_TRIGGERS = [
+    'DROP TRIGGER IF EXISTS posts_search_post_insert',
+    'DROP TRIGGER IF EXISTS posts_search_post_update',
+    'DROP TRIGGER IF EXISTS posts_search_post_delete',
+    *[sql for sql in search.CREATE_SQL if 'ON posts_post' in sql],
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            migrations.RunPython.noop, search.run(POST_TRIGGERS)),
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Комментариев'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='last_comment_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Последний комментарий'),
+        ),
+        migrations.RunPython(
+            search.run(POST_TRIGGERS), migrations.RunPython.noop),
+        migrations.RunPython(fill_comments_count, migrations.RunPython.noop),
+    ]
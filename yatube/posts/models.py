@@ -32,15 +32,49 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True
     )
+    version = models.PositiveIntegerField(
+        default=1,
+        editable=False,
+        verbose_name='Версия'
+    )
+    comments_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Комментариев'
+    )
+    last_comment_at = models.DateTimeField(
+        blank=True, null=True,
+        editable=False,
+        verbose_name='Последний комментарий'
+    )
 
     class Meta:
         ordering = ['-pub_date']
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        # SQLite дописывает rowid в конец индекса и читает его с конца,
+        # поэтому возрастающие индексы покрывают сортировку курсора
+        # (-pub_date, -id) без временного B-дерева.
+        indexes = [
+            models.Index(fields=['pub_date'], name='post_date_idx'),
+            models.Index(
+                fields=['author', 'pub_date'], name='post_author_date_idx'),
+            models.Index(
+                fields=['group', 'pub_date'], name='post_group_date_idx'),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
+    def save(self, *args, **kwargs):
+        # Версия входит в ключи кэша карточек: любое изменение поста
+        # делает закэшированную разметку недостижимой.
+        if self.pk is not None:
+            self.version += 1
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'version'}
+        super().save(*args, **kwargs)
+
 
 class Group(models.Model):
     title = models.CharField(max_length=200, verbose_name='Группа')
@@ -64,6 +98,12 @@ class Comment(models.Model):
     text = models.TextField(verbose_name='Текст комментария')
     created = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['post', 'created'], name='comment_post_created_idx'),
+        ]
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -76,3 +116,145 @@ class Follow(models.Model):
         related_name='following',
         on_delete=models.CASCADE
     )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'], name='unique_follow'),
+        ]
+        indexes = [
+            models.Index(
+                fields=['author', 'user'], name='follow_author_user_idx'),
+        ]
+
+
+class FeedEntry(models.Model):
+    """Строка ленты подписок, материализованная при публикации поста."""
+    user = models.ForeignKey(
+        User,
+        related_name='feed',
+        on_delete=models.CASCADE
+    )
+    post = models.ForeignKey(
+        Post,
+        related_name='feed_entries',
+        on_delete=models.CASCADE
+    )
+    author = models.ForeignKey(
+        User,
+        related_name='+',
+        on_delete=models.CASCADE
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='unique_feed_entry'),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-id'],
+                name='feed_user_date_idx'),
+            models.Index(
+                fields=['user', 'author'], name='feed_user_author_idx'),
+        ]
+
+
+class AuthorStats(models.Model):
+    """Счётчики пользователя, обновляемые вместе с постами и подписками."""
+    user = models.OneToOneField(
+        User,
+        primary_key=True,
+        related_name='stats',
+        on_delete=models.CASCADE
+    )
+    posts_count = models.PositiveIntegerField(default=0)
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+
+
+class FollowSuggestion(models.Model):
+    """Автор, которого стоит предложить пользователю; считается офлайн.
+
+    score — сколько авторов из подписок пользователя подписаны на него.
+    """
+    user = models.ForeignKey(
+        User,
+        related_name='suggestions',
+        on_delete=models.CASCADE
+    )
+    author = models.ForeignKey(
+        User,
+        related_name='+',
+        on_delete=models.CASCADE
+    )
+    score = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'], name='unique_suggestion'),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', 'score'], name='suggestion_user_score_idx'),
+        ]
+
+
+class TrendingScore(models.Model):
+    """Затухающая популярность поста, приведённая к TrendingEpoch.
+
+    Очки всех постов отнесены к одному моменту, поэтому их порядок со
+    временем не меняется и топ читается по индексу на score.
+    """
+    post = models.OneToOneField(
+        Post,
+        primary_key=True,
+        related_name='trending',
+        on_delete=models.CASCADE
+    )
+    score = models.FloatField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['score'], name='trending_score_idx'),
+        ]
+
+
+class TrendingEpoch(models.Model):
+    """Момент, к которому приведены очки TrendingScore; одна строка."""
+    started = models.DateTimeField()
+
+
+class SearchField(models.TextField):
+    """Колонка FTS5, поддерживающая фильтр ``__match``."""
+
+
+@SearchField.register_lookup
+class Match(models.Lookup):
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', lhs_params + rhs_params
+
+
+class SearchEntry(models.Model):
+    """Строка полнотекстового индекса; таблицу и триггеры создаёт миграция.
+
+    Посты лежат под rowid = id * 2, комментарии под rowid = id * 2 + 1.
+    """
+    rowid = models.IntegerField(primary_key=True)
+    text = SearchField()
+    post = models.ForeignKey(
+        Post,
+        related_name='+',
+        on_delete=models.DO_NOTHING,
+        db_constraint=False
+    )
+
+    class Meta:
+        managed = False
+        db_table = 'posts_search'
@@ -0,0 +1,170 @@
+import base64
+import binascii
+import json
+from collections.abc import Sequence
+from datetime import date, datetime
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+FORWARD = 'n'
+BACKWARD = 'p'
+# Ключ курсора — только скаляры: вложенные значения ломают to_python.
+SCALARS = (str, int, float)
+
+
+class CursorPaginator:
+    """Keyset-пагинация без COUNT и OFFSET.
+
+    Страница выбирается условием по ключу сортировки последней
+    (или первой) записи предыдущей страницы, поэтому глубокие
+    страницы читаются так же быстро, как первая.
+    """
+    is_cursor = True
+
+    def __init__(self, object_list, per_page,
+                 ordering=('-pub_date', '-id')):
+        descending = {field.startswith('-') for field in ordering}
+        if len(descending) != 1:
+            raise ValueError(
+                'Все поля сортировки должны иметь одно направление')
+        self.object_list = object_list
+        self.per_page = per_page
+        self.ordering = tuple(ordering)
+        self.descending = descending.pop()
+        self.fields = tuple(field.lstrip('-') for field in ordering)
+
+    def get_page(self, cursor=None):
+        """Страница по курсору; неверный курсор даёт первую страницу."""
+        direction, position = self.decode(cursor)
+        backwards = direction == BACKWARD and position is not None
+        queryset = self.object_list
+        if position is not None:
+            queryset = queryset.filter(
+                self._after(position, self.descending != backwards))
+        ordering = self.ordering
+        if backwards:
+            ordering = self._reverse(ordering)
+        rows = list(queryset.order_by(*ordering)[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+            return CursorPage(
+                rows, self, has_next=True, has_previous=has_more)
+        return CursorPage(
+            rows, self, has_next=has_more, has_previous=position is not None)
+
+    def _after(self, position, less):
+        lookup = 'lt' if less else 'gt'
+        condition = Q()
+        for index, field in enumerate(self.fields):
+            step = Q(**{f'{field}__{lookup}': position[index]})
+            for prev_field, value in zip(self.fields[:index], position):
+                step &= Q(**{prev_field: value})
+            condition |= step
+        return condition
+
+    @staticmethod
+    def _reverse(ordering):
+        return tuple(
+            field[1:] if field.startswith('-') else f'-{field}'
+            for field in ordering)
+
+    def key(self, obj):
+        if isinstance(obj, dict):
+            return [obj[field] for field in self.fields]
+        return [getattr(obj, field) for field in self.fields]
+
+    def _field(self, name):
+        # Ключом может быть и аннотация, например дата строки ленты.
+        annotations = self.object_list.query.annotations
+        if name in annotations:
+            return annotations[name].output_field
+        return self.object_list.model._meta.get_field(name)
+
+    def encode(self, direction, obj):
+        return encode_cursor(direction, self.key(obj))
+
+    def decode(self, cursor):
+        direction, values = decode_cursor(cursor, len(self.fields))
+        if values is None:
+            return direction, None
+        try:
+            position = [
+                self._field(field).to_python(value)
+                for field, value in zip(self.fields, values)]
+        except (ValidationError, TypeError, ValueError):
+            return FORWARD, None
+        return direction, position
+
+
+def encode_cursor(direction, values):
+    """Упаковывает направление и ключ записи в непрозрачный токен."""
+    raw = json.dumps([direction, values], default=_isoformat)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, size):
+    """Распаковывает токен; для пустого или битого токена ключ — None."""
+    if not cursor:
+        return FORWARD, None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        direction, values = json.loads(
+            base64.urlsafe_b64decode(padded.encode()))
+        if direction not in (FORWARD, BACKWARD) or len(values) != size:
+            raise ValueError
+        if not all(isinstance(value, SCALARS) for value in values):
+            raise ValueError
+    except (binascii.Error, ValueError, TypeError):
+        return FORWARD, None
+    return direction, values
+
+
+def _isoformat(value):
+    # DjangoJSONEncoder обрезает микросекунды, а курсору нужна точная дата.
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} не сериализуется в курсор')
+
+
+class CursorPage(Sequence):
+    """Страница курсорной пагинации с токенами соседних страниц."""
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next and bool(object_list)
+        self._has_previous = has_previous and bool(object_list)
+
+    def __repr__(self):
+        return f'<CursorPage of {len(self)} objects>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        if not self._has_next:
+            return None
+        return self.paginator.encode(FORWARD, self.object_list[-1])
+
+    @property
+    def previous_cursor(self):
+        if not self._has_previous:
+            return None
+        return self.paginator.encode(BACKWARD, self.object_list[0])
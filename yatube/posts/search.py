@@ -0,0 +1,138 @@
+import itertools
+import re
+
+from django.db import connection, transaction
+from django.db.models import F
+from django.db.models.functions import Mod
+
+from .models import Comment, Post, SearchEntry
+from .paginators import BACKWARD, CursorPage, decode_cursor, encode_cursor
+
+
+SEARCH_TABLE = SearchEntry._meta.db_table
+REBUILD_BATCH_SIZE = 1000
+
+
+def available():
+    return connection.vendor == 'sqlite'
+
+
+def build_match(query):
+    """Превращает ввод пользователя в безопасный запрос FTS5.
+
+    Каждое слово берётся в кавычки, поэтому операторы FTS5 в запросе
+    не интерпретируются; слова объединяются через AND.
+    """
+    words = re.findall(r'\w+', query or '')
+    return ' '.join(f'"{word}"' for word in words)
+
+
+def matching_post_ids(match):
+    """Подзапрос с id постов, у которых совпал текст или комментарий."""
+    return SearchEntry.objects.filter(text__match=match).values('post_id')
+
+
+def matching_comment_ids(match):
+    return SearchEntry.objects.annotate(
+        kind=Mod('rowid', 2)
+    ).filter(text__match=match, kind=1).values(
+        comment_id=(F('rowid') - 1) / 2)
+
+
+class SearchPaginator:
+    """Keyset-пагинация выдачи, отсортированной по bm25.
+
+    Пост получает лучший ранг среди своего текста и комментариев;
+    ключ страницы — пара (ранг, id поста).
+    """
+    is_cursor = True
+
+    def __init__(self, query, per_page):
+        self.match = build_match(query)
+        self.per_page = per_page
+        self.scores = {}
+
+    def _rows(self, position, backwards):
+        comparison, order = ('<', 'DESC') if backwards else ('>', 'ASC')
+        having = ''
+        params = [self.match]
+        if position is not None:
+            having = f'HAVING (score, post_id) {comparison} (%s, %s)'
+            params.extend(position)
+        params.append(self.per_page + 1)
+        sql = (
+            f'SELECT post_id, MIN(rank) AS score FROM {SEARCH_TABLE} '
+            f'WHERE {SEARCH_TABLE} MATCH %s GROUP BY post_id {having} '
+            f'ORDER BY score {order}, post_id {order} LIMIT %s')
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+    def get_page(self, cursor=None):
+        direction, position = self.decode(cursor)
+        if not self.match:
+            return CursorPage([], self, has_next=False, has_previous=False)
+        backwards = direction == BACKWARD and position is not None
+        rows = self._rows(position, backwards)
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+        self.scores = dict(rows)
+        posts = Post.objects.select_related(
+            'author', 'group').in_bulk(self.scores)
+        object_list = [posts[post_id] for post_id, _ in rows]
+        if backwards:
+            return CursorPage(
+                object_list, self, has_next=True, has_previous=has_more)
+        return CursorPage(
+            object_list, self,
+            has_next=has_more, has_previous=position is not None)
+
+    @staticmethod
+    def decode(cursor):
+        """Позиция курсора как (score, post_id); битая — первая страница."""
+        direction, position = decode_cursor(cursor, 2)
+        if position is None:
+            return direction, None
+        try:
+            score, post_id = float(position[0]), int(position[1])
+        except (TypeError, ValueError, OverflowError):
+            return direction, None
+        return direction, (score, post_id)
+
+    def encode(self, direction, post):
+        return encode_cursor(direction, [self.scores[post.id], post.id])
+
+
+def _batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def rebuild(batch_size=REBUILD_BATCH_SIZE):
+    """Перестраивает индекс, читая посты и комментарии пачками."""
+    posts = Post.objects.order_by().values_list('id', 'text')
+    comments = Comment.objects.order_by().values_list('id', 'text', 'post_id')
+    rows = itertools.chain(
+        ((pk * 2, text, pk) for pk, text in posts.iterator(
+            chunk_size=batch_size)),
+        ((pk * 2 + 1, text, post_id)
+         for pk, text, post_id in comments.iterator(
+             chunk_size=batch_size)))
+    sql = (
+        f'INSERT INTO {SEARCH_TABLE} (rowid, text, post_id) '
+        f'VALUES (%s, %s, %s)')
+    total = 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+        for batch in _batches(rows, batch_size):
+            cursor.executemany(sql, batch)
+            total += len(batch)
+    return total
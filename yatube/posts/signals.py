@@ -0,0 +1,130 @@
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save)
+from django.dispatch import receiver
+
+from . import feed, generations, stats, trending
+from .cards import CARD_USER_FIELDS, bump_versions
+from .models import Comment, Follow, Group, Post, User
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        feed.fan_out(instance)
+
+
+@receiver(post_save, sender=Post)
+def bump_post_listings(sender, instance, raw=False, **kwargs):
+    if not raw:
+        generations.bump_post(instance)
+
+
+@receiver(post_save, sender=Post)
+def count_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        stats.adjust(instance.author_id, posts_count=1)
+
+
+@receiver(post_delete, sender=Post)
+def uncount_post(sender, instance, **kwargs):
+    stats.adjust(instance.author_id, posts_count=-1)
+
+
+@receiver(post_delete, sender=Post)
+def bump_deleted_post_listings(sender, instance, **kwargs):
+    generations.bump_post(instance)
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created, raw=False, **kwargs):
+    # Удаления пересчитывают админка и repair_stats: сигнал на каждый
+    # комментарий при каскадном удалении поста обошёлся бы дорого.
+    if created and not raw:
+        stats.count_comment(instance)
+        trending.record_comment(instance)
+        generations.bump_post(instance.post)
+
+
+@receiver(post_save, sender=Follow)
+def count_follow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        stats.adjust(instance.author_id, followers_count=1)
+        stats.adjust(instance.user_id, following_count=1)
+        trending.record_follows([instance.author_id])
+
+
+@receiver(post_delete, sender=Follow)
+def uncount_follow(sender, instance, **kwargs):
+    stats.adjust(instance.author_id, followers_count=-1)
+    stats.adjust(instance.user_id, following_count=-1)
+
+
+def _bump_authors(author_ids):
+    """Профили и ленты подписчиков авторов, чьи карточки поменялись."""
+    usernames = User.objects.filter(
+        pk__in=author_ids).values_list('username', flat=True)
+    generations.bump(
+        *[generations.profile_scope(username) for username in usernames])
+    for author_id in author_ids:
+        generations.bump_followers(author_id)
+
+
+@receiver(pre_save, sender=User)
+def remember_username(sender, instance, update_fields=None, raw=False,
+                      **kwargs):
+    # Старое имя нужно, чтобы сбросить кэш профиля по прежнему адресу.
+    if raw or instance.pk is None:
+        return
+    if update_fields is not None and 'username' not in update_fields:
+        return
+    instance._old_username = User.objects.filter(
+        pk=instance.pk).values_list('username', flat=True).first()
+
+
+@receiver(post_save, sender=User)
+def bump_author_cards(sender, instance, created, update_fields=None,
+                      raw=False, **kwargs):
+    if created or raw:
+        return
+    if update_fields is not None and not CARD_USER_FIELDS & set(
+            update_fields):
+        return
+    posts = Post.objects.filter(author=instance)
+    bump_versions(posts)
+    slugs = posts.filter(group__isnull=False).order_by().values_list(
+        'group__slug', flat=True).distinct()
+    usernames = {instance.username, getattr(
+        instance, '_old_username', None) or instance.username}
+    generations.bump(
+        generations.index_scope(),
+        *[generations.profile_scope(username) for username in usernames],
+        *[generations.group_scope(slug) for slug in slugs])
+    generations.bump_followers(instance.pk)
+
+
+@receiver(pre_save, sender=Group)
+def remember_slug(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk is None:
+        return
+    instance._old_slug = Group.objects.filter(
+        pk=instance.pk).values_list('slug', flat=True).first()
+
+
+@receiver(post_save, sender=Group)
+def bump_group_cards(sender, instance, created, raw=False, **kwargs):
+    if created or raw:
+        return
+    posts = Post.objects.filter(group=instance)
+    bump_versions(posts)
+    slugs = {instance.slug, getattr(
+        instance, '_old_slug', None) or instance.slug}
+    generations.bump(
+        generations.index_scope(),
+        *[generations.group_scope(slug) for slug in slugs])
+    _bump_authors(set(
+        posts.order_by().values_list('author_id', flat=True).distinct()))
+
+
+@receiver(pre_delete, sender=Group)
+def bump_deleted_group_cards(sender, instance, **kwargs):
+    bump_versions(Post.objects.filter(group=instance))
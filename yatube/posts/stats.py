@@ -0,0 +1,86 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import AuthorStats, Comment, Follow, Post
+
+
+def adjust(user_id, **deltas):
+    """Атомарно сдвигает счётчики пользователя на заданные величины.
+
+    Вызывается внутри транзакции записи, поэтому счётчик откатывается
+    вместе с ней.
+    """
+    updates = {
+        field: Greatest(F(field) + delta, Value(0))
+        for field, delta in deltas.items()}
+    with transaction.atomic():
+        if AuthorStats.objects.filter(user_id=user_id).update(**updates):
+            return
+        if any(delta < 0 for delta in deltas.values()):
+            return
+        try:
+            with transaction.atomic():
+                AuthorStats.objects.create(user_id=user_id, **deltas)
+        except IntegrityError:
+            AuthorStats.objects.filter(user_id=user_id).update(**updates)
+
+
+def get_stats(user):
+    """Счётчики пользователя; подгружайте их через select_related('stats')."""
+    try:
+        return user.stats
+    except AuthorStats.DoesNotExist:
+        return AuthorStats(user=user)
+
+
+def recompute(user_ids):
+    """Пересчитывает счётчики пачки пользователей по постам и подпискам."""
+    def counts(queryset, field):
+        return dict(
+            queryset.filter(**{f'{field}__in': user_ids})
+            .order_by().values_list(field).annotate(total=Count('pk')))
+
+    posts = counts(Post.objects.all(), 'author_id')
+    followers = counts(Follow.objects.all(), 'author_id')
+    following = counts(Follow.objects.all(), 'user_id')
+    rows = [
+        AuthorStats(
+            user_id=user_id,
+            posts_count=posts.get(user_id, 0),
+            followers_count=followers.get(user_id, 0),
+            following_count=following.get(user_id, 0))
+        for user_id in user_ids]
+    with transaction.atomic():
+        existing = set(AuthorStats.objects.filter(
+            user_id__in=user_ids).values_list('user_id', flat=True))
+        AuthorStats.objects.bulk_update(
+            [row for row in rows if row.user_id in existing],
+            ['posts_count', 'followers_count', 'following_count'])
+        AuthorStats.objects.bulk_create(
+            [row for row in rows if row.user_id not in existing])
+    return len(rows)
+
+
+def count_comment(comment):
+    """Учитывает новый комментарий в счётчике поста одним UPDATE.
+
+    Версия поста растёт вместе со счётчиком: он выводится в карточке.
+    """
+    Post.objects.filter(pk=comment.post_id).update(
+        comments_count=F('comments_count') + 1,
+        last_comment_at=comment.created,
+        version=F('version') + 1)
+
+
+def recount_comments(post_ids):
+    """Пересчитывает счётчики комментариев постов одним UPDATE."""
+    comments = Comment.objects.filter(
+        post=OuterRef('pk')).order_by().values('post')
+    return Post.objects.filter(pk__in=post_ids).update(
+        comments_count=Coalesce(
+            Subquery(comments.annotate(total=Count('pk')).values('total')),
+            Value(0)),
+        last_comment_at=Subquery(
+            comments.annotate(last=Max('created')).values('last')),
+        version=F('version') + 1)
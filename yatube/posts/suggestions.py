@@ -0,0 +1,111 @@
+"""Кого почитать: авторы, на которых подписаны ваши авторы.
+
+Считать это на каждый запрос по Follow — квадратично, поэтому подсказки
+считаются офлайн командой compute_suggestions: граф подписок целиком
+грузится в разреженную матрицу A (строка — читатель, столбец — автор),
+и для пачки читателей берётся произведение A[пачка] @ A. Элемент (u, a)
+в нём — сколько авторов из подписок u подписаны на a. Страницы читают
+готовую таблицу одним запросом по индексу (user, score).
+"""
+from itertools import chain
+
+import numpy as np
+from scipy import sparse
+
+from core.db import write_transaction
+from .models import Follow, FollowSuggestion
+
+
+SUGGESTIONS_PER_USER = 20
+SUGGESTIONS_SHOWN = 5
+SUGGESTIONS_CHUNK_SIZE = 1000
+SUGGESTIONS_BATCH_SIZE = 1000
+
+
+def for_user(user, limit=SUGGESTIONS_SHOWN):
+    """Лучшие подсказки; подписки, сделанные после расчёта, отсеиваются."""
+    return list(FollowSuggestion.objects.filter(
+        user=user
+    ).exclude(
+        author__following__user=user
+    ).select_related('author').order_by('-score')[:limit])
+
+
+def load_graph():
+    """id пользователей и матрица подписок в индексах этих id."""
+    rows = Follow.objects.order_by().values_list('user_id', 'author_id')
+    pairs = np.fromiter(
+        chain.from_iterable(rows.iterator(chunk_size=SUGGESTIONS_BATCH_SIZE)),
+        dtype=np.int64).reshape(-1, 2)
+    ids, inverse = np.unique(pairs, return_inverse=True)
+    inverse = inverse.reshape(-1, 2)
+    graph = sparse.csr_matrix(
+        (np.ones(len(pairs), dtype=np.float32),
+         (inverse[:, 0], inverse[:, 1])),
+        shape=(len(ids), len(ids)))
+    return ids, graph
+
+
+def _scores(graph, rows):
+    """Очки кандидатов для пачки читателей без себя и своих подписок."""
+    follows = graph[rows]
+    known = follows + sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.float32),
+         (np.arange(len(rows)), rows)),
+        shape=follows.shape)
+    scores = follows @ graph
+    scores = (scores - scores.multiply(known > 0)).tocsr()
+    scores.eliminate_zeros()
+    return scores
+
+
+def _top(scores, index, limit):
+    begin, end = scores.indptr[index], scores.indptr[index + 1]
+    columns = scores.indices[begin:end]
+    values = scores.data[begin:end]
+    if len(values) > limit:
+        best = np.argpartition(-values, limit - 1)[:limit]
+        columns, values = columns[best], values[best]
+    return columns, values
+
+
+def _rows(ids, graph, per_user, chunk_size):
+    """Пачки подсказок как массивы (user_id, author_id, score)."""
+    readers = np.flatnonzero(graph.getnnz(axis=1))
+    for start in range(0, len(readers), chunk_size):
+        rows = readers[start:start + chunk_size]
+        scores = _scores(graph, rows)
+        users, authors, values = [], [], []
+        for index, row in enumerate(rows):
+            columns, top = _top(scores, index, per_user)
+            users.append(np.full(len(columns), ids[row]))
+            authors.append(ids[columns])
+            values.append(top)
+        if users:
+            yield (
+                np.concatenate(users), np.concatenate(authors),
+                np.concatenate(values))
+
+
+@write_transaction
+def _replace(chunks):
+    FollowSuggestion.objects.all().delete()
+    for users, authors, values in chunks:
+        FollowSuggestion.objects.bulk_create(
+            [FollowSuggestion(user_id=int(user), author_id=int(author),
+                              score=float(value))
+             for user, author, value in zip(users, authors, values)],
+            batch_size=SUGGESTIONS_BATCH_SIZE)
+
+
+def compute(per_user=SUGGESTIONS_PER_USER,
+            chunk_size=SUGGESTIONS_CHUNK_SIZE):
+    """Пересчитывает таблицу подсказок целиком.
+
+    Всё считается до транзакции, а запись — короткая замена таблицы:
+    блокировка записи SQLite не держится, пока перемножаются матрицы.
+    """
+    ids, graph = load_graph()
+    chunks = list(_rows(ids, graph, per_user, chunk_size))
+    _replace(chunks)
+    return sum(len(users) for users, _, _ in chunks)
@@ -0,0 +1,80 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from ..models import Comment, Follow, Group, Post, User
+from ..management.commands.bench_routes import percentile
+
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class SeedBenchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        call_command(
+            'seed_data', users=20, groups=3, posts=60, comments=40,
+            follows=50, images=0.5, seed=1, stdout=StringIO())
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_seed_volumes(self):
+        self.assertEqual(User.objects.count(), 20)
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertEqual(Post.objects.count(), 60)
+        self.assertEqual(Comment.objects.count(), 40)
+        self.assertTrue(Follow.objects.exists())
+        self.assertTrue(Post.objects.exclude(image='').exists())
+
+    def test_seed_skew(self):
+        """Первые авторы пишут заметно больше остальных."""
+        counts = sorted(
+            (author.posts.count() for author in User.objects.all()),
+            reverse=True)
+        self.assertGreater(counts[0], 60 / 20 * 2)
+
+    def test_bench_routes(self):
+        output = os.path.join(TEMP_MEDIA_ROOT, 'bench.json')
+        call_command(
+            'bench_routes', requests=3, warmup=1, output=output,
+            stdout=StringIO())
+        with open(output, encoding='utf-8') as stream:
+            report = json.load(stream)
+        routes = report['routes']
+        self.assertIn('index', routes)
+        self.assertIn('api_posts', routes)
+        self.assertNotIn('profile_follow', routes)
+        for name, result in routes.items():
+            with self.subTest(route=name):
+                self.assertEqual(result['status'], 200)
+                self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+
+    def test_bench_routes_cold_keeps_cache(self):
+        """Холодный прогон сбрасывает свои страницы, а не весь кэш."""
+        cache.set('session:чужая', 'живая')
+        output = os.path.join(TEMP_MEDIA_ROOT, 'cold.json')
+        call_command(
+            'bench_routes', requests=2, warmup=1, cold=True, output=output,
+            stdout=StringIO())
+        self.assertEqual(cache.get('session:чужая'), 'живая')
+        with open(output, encoding='utf-8') as stream:
+            routes = json.load(stream)['routes']
+        self.assertGreater(routes['index']['queries_per_request'], 0)
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([7], 95), 7)
@@ -1,4 +1,7 @@
-from django.test import TestCase, Client
+from io import BytesIO
+
+from PIL import Image
+from django.test import TestCase, Client, override_settings
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.urls import reverse
@@ -124,3 +127,45 @@ class PostCreateFormTest(TestCase):
         }
         for field, value in dict_match.items():
             self.assertEqual(field, value)
+
+
+@override_settings(
+    POST_IMAGE_MAX_SIDE=100, POST_IMAGE_FORMAT='JPEG', POST_IMAGE_QUALITY=80)
+class ImageIngestTest(TestCase):
+    @staticmethod
+    def upload(size, name='photo.png', exif=None):
+        file_obj = BytesIO()
+        image = Image.new('RGBA', size, (255, 0, 0, 128))
+        if exif is not None:
+            image.convert('RGB').save(file_obj, 'JPEG', exif=exif)
+        else:
+            image.save(file_obj, 'PNG')
+        return SimpleUploadedFile(name, file_obj.getvalue())
+
+    def clean(self, upload):
+        form = PostForm(data={'text': 'Текст'}, files={'image': upload})
+        return form, form.is_valid()
+
+    def test_image_downscaled_and_reencoded(self):
+        form, valid = self.clean(self.upload((400, 200)))
+        self.assertTrue(valid)
+        image_file = form.cleaned_data['image']
+        self.assertEqual(image_file.name, 'photo.jpg')
+        with Image.open(image_file) as image:
+            self.assertEqual(image.format, 'JPEG')
+            self.assertEqual(image.size, (100, 50))
+
+    def test_exif_stripped(self):
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera maker'
+        form, valid = self.clean(
+            self.upload((50, 50), name='photo.jpg', exif=exif))
+        self.assertTrue(valid)
+        with Image.open(form.cleaned_data['image']) as image:
+            self.assertNotIn('exif', image.info)
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=100)
+    def test_decompression_bomb_rejected(self):
+        form, valid = self.clean(self.upload((20, 20)))
+        self.assertFalse(valid)
+        self.assertIn('image', form.errors)
@@ -1,8 +1,17 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
 from xml.etree.ElementTree import Comment
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
 from django.test import TestCase
 
-from ..models import Group, Post, Comment
+from .. import importer
+from ..models import (
+    AuthorStats, Group, Post, Comment, Follow, FeedEntry)
 
 User = get_user_model()
 
@@ -58,3 +67,174 @@ class PostModelTest(TestCase):
     def test_comment_fields(self):
         comment_field = self.comment._meta.get_field('text').verbose_name
         self.assertEqual(comment_field, 'Текст комментария')
+
+
+class AuthorStatsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def stats(self, user):
+        return AuthorStats.objects.get(user=user)
+
+    def test_counters_follow_writes(self):
+        """Счётчики меняются при создании и удалении постов и подписок."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+        post.delete()
+        follow.delete()
+        self.assertEqual(self.stats(self.author).posts_count, 0)
+        self.assertEqual(self.stats(self.author).followers_count, 0)
+        self.assertEqual(self.stats(self.reader).following_count, 0)
+
+    def test_follow_unique(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Follow.objects.create(user=self.reader, author=self.author)
+
+    def test_repair_stats(self):
+        Post.objects.bulk_create(
+            [Post(author=self.author, text=f'Пост {i}') for i in range(3)])
+        Follow.objects.bulk_create(
+            [Follow(user=self.reader, author=self.author)])
+        call_command('repair_stats', chunk_size=1, stdout=StringIO())
+        self.assertEqual(self.stats(self.author).posts_count, 3)
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+
+
+class CommentCountTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(author=cls.user, text='Пост')
+
+    def test_comment_updates_counter(self):
+        """Новый комментарий увеличивает счётчик и версию поста."""
+        comment = Comment.objects.create(
+            post=self.post, author=self.user, text='Комментарий')
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(post.last_comment_at, comment.created)
+        self.assertEqual(post.version, self.post.version + 1)
+
+    def test_repair_stats_recounts_comments(self):
+        Comment.objects.bulk_create([
+            Comment(post=self.post, author=self.user, text=f'К {i}')
+            for i in range(3)])
+        call_command('repair_stats', chunk_size=1, stdout=StringIO())
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertEqual(post.comments_count, 3)
+        self.assertIsNotNone(post.last_comment_at)
+
+
+class ImportArchiveTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='-')
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp_dir.cleanup()
+        super().tearDownClass()
+
+    def write(self, name, content):
+        path = os.path.join(self.tmp_dir.name, name)
+        with open(path, 'w', encoding='utf-8') as stream:
+            stream.write(content)
+        return path
+
+    def load(self, kind, path, **options):
+        stdout, stderr = StringIO(), StringIO()
+        call_command(
+            'import_archive', kind, path, batch_size=2,
+            stdout=stdout, stderr=stderr, **options)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_import_posts_ndjson(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        rows = [
+            {'author': 'author', 'text': f'Пост {i}', 'group': 'group',
+             'pub_date': f'2020-01-0{i + 1}T10:00:00+00:00'}
+            for i in range(3)]
+        rows.append({'author': 'nobody', 'text': 'Чужой пост'})
+        path = self.write('posts.ndjson', '\n'.join(
+            [json.dumps(row) for row in rows] + ['{broken']))
+        stdout, stderr = self.load('posts', path)
+        self.assertIn('Загружено: 3, пропущено: 2', stdout)
+        self.assertIn('строк/с', stdout)
+        self.assertIn('Строка 4', stderr)
+        posts = Post.objects.filter(author=self.author, group=self.group)
+        self.assertEqual(posts.count(), 3)
+        self.assertEqual(posts.first().pub_date.day, 3)
+        self.assertEqual(
+            AuthorStats.objects.get(user=self.author).posts_count, 3)
+        self.assertEqual(
+            FeedEntry.objects.filter(user=self.reader).count(), 3)
+
+    def test_import_duplicate_post_ids(self):
+        rows = [
+            {'id': 500, 'author': 'author', 'text': 'Первый'},
+            {'id': 500, 'author': 'author', 'text': 'Повтор'},
+            {'id': 501, 'author': 'author', 'text': 'Второй'},
+        ]
+        path = self.write('posts.ndjson', '\n'.join(
+            json.dumps(row) for row in rows))
+        stdout, _ = self.load('posts', path)
+        self.assertIn('Загружено: 2, пропущено: 1', stdout)
+        self.assertEqual(Post.objects.get(pk=500).text, 'Первый')
+        self.assertEqual(
+            AuthorStats.objects.get(user=self.author).posts_count, 2)
+
+    def test_failed_batch_keeps_stats(self):
+        """Сбой пачки не оставляет записанные пачки без счётчиков."""
+        flush = importer.Importer.flush
+        calls = []
+
+        def failing_flush(self, batch):
+            calls.append(batch)
+            if len(calls) > 1:
+                raise IntegrityError('сбой')
+            flush(self, batch)
+
+        rows = [{'author': 'author', 'text': f'Пост {i}'} for i in range(3)]
+        path = self.write('posts.ndjson', '\n'.join(
+            json.dumps(row) for row in rows))
+        with mock.patch.object(importer.Importer, 'flush', failing_flush):
+            with self.assertRaises(IntegrityError):
+                self.load('posts', path)
+        self.assertEqual(
+            AuthorStats.objects.get(user=self.author).posts_count, 2)
+
+    def test_import_csv_with_new_authors(self):
+        path = self.write(
+            'follows.csv', 'user,author\nreader,newcomer\nreader,newcomer\n')
+        stdout, _ = self.load('follows', path, create_authors=True)
+        self.assertIn('Загружено: 1, пропущено: 1', stdout)
+        newcomer = User.objects.get(username='newcomer')
+        self.assertTrue(
+            Follow.objects.filter(user=self.reader, author=newcomer).exists())
+        self.assertEqual(
+            AuthorStats.objects.get(user=newcomer).followers_count, 1)
+
+    def test_import_comments_skips_missing_posts(self):
+        post = Post.objects.create(author=self.author, text='Пост')
+        path = self.write('comments.csv', (
+            'post,author,text,created\n'
+            f'{post.id},reader,Первый,2020-01-01T10:00:00\n'
+            f'{post.id + 100},reader,Потерянный,\n'))
+        stdout, _ = self.load('comments', path)
+        self.assertIn('Загружено: 1, пропущено: 1', stdout)
+        comment = Comment.objects.get(post=post)
+        self.assertEqual(comment.created.year, 2020)
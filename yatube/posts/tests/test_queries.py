@@ -0,0 +1,150 @@
+from unittest import skipUnless
+
+from django.test import TestCase, Client
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+
+from .. import feed
+from ..models import Post, Group, Comment, Follow
+
+
+User = get_user_model()
+
+ROWS = (10, 100, 1000)
+AUTHORS = 10
+
+
+class QueryBudgetTest(TestCase):
+    """Число запросов страниц не зависит от количества записей.
+
+    Бюджеты посчитаны для авторизованного читателя: два запроса из них
+    уходят на сессию и пользователя, ещё один у group_list, profile и
+    post_detail — на ETag, у profile и follow_index — на подсказки.
+    """
+    budgets = {
+        'posts:index': 4,
+        'posts:group_list': 6,
+        'posts:profile': 8,
+        'posts:follow_index': 5,
+        'posts:post_detail': 5,
+    }
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create(username='reader')
+        cls.authors = [
+            User.objects.create(username=f'author{i}', first_name=f'Имя {i}')
+            for i in range(AUTHORS)]
+        cls.group = Group.objects.create(
+            title='Test group',
+            slug='test-slug',
+            description='Test description')
+        cls.groups = [
+            Group.objects.create(
+                title=f'Group {i}', slug=f'group-{i}', description='-')
+            for i in range(AUTHORS)]
+        Follow.objects.bulk_create([
+            Follow(user=cls.reader, author=author) for author in cls.authors])
+        cls.post = Post.objects.create(
+            author=cls.authors[0], text='Пост с комментариями')
+        cls.auth_client = Client()
+        cls.auth_client.force_login(cls.reader)
+
+    @classmethod
+    def setUp(self):
+        cache.clear()
+
+    def fill(self, rows):
+        """Доводит количество постов группы и комментариев до rows."""
+        missing = rows - Post.objects.filter(group=self.group).count()
+        Post.objects.bulk_create([
+            Post(
+                text=f'Пост {i}',
+                author=self.authors[i % AUTHORS],
+                group=self.group if i % 2 else self.groups[i % AUTHORS])
+            for i in range(missing * 2)])
+        missing = rows - self.post.comments.count()
+        Comment.objects.bulk_create([
+            Comment(
+                post=self.post,
+                author=self.authors[i % AUTHORS],
+                text=f'Комментарий {i}')
+            for i in range(missing)])
+
+    def addresses(self):
+        return {
+            'posts:index': reverse('posts:index'),
+            'posts:group_list': reverse(
+                'posts:group_list', kwargs={'slug': self.group.slug}),
+            'posts:profile': reverse(
+                'posts:profile',
+                kwargs={'username': self.authors[1].username}),
+            'posts:follow_index': reverse('posts:follow_index'),
+            'posts:post_detail': reverse(
+                'posts:post_detail', kwargs={'post_id': self.post.id}),
+        }
+
+    def test_query_budgets(self):
+        for rows in ROWS:
+            self.fill(rows)
+            for name, address in self.addresses().items():
+                with self.subTest(rows=rows, view=name):
+                    cache.clear()
+                    with self.assertNumQueries(self.budgets[name]):
+                        response = self.auth_client.get(address)
+                    self.assertEqual(response.status_code, 200)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN есть в SQLite')
+class QueryPlanTest(TestCase):
+    """Горячие запросы идут по индексам, без полного скана и сортировки."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='reader')
+
+    def plan(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def queries(self):
+        posts = Post.objects.order_by('-pub_date', '-id')
+        feed_posts = feed.posts(self.user).order_by(*feed.FEED_ORDERING)
+        now = timezone.now()
+        return {
+            'index': posts.select_related('author', 'group')[:11],
+            'group': posts.filter(group_id=1).select_related('author')[:11],
+            'profile': posts.filter(author_id=1).select_related('group')[:11],
+            'profile_cursor': posts.filter(
+                author_id=1, pub_date__lt=now)[:11],
+            'follow_feed': feed_posts[:11],
+            'follow_feed_cursor': feed_posts.filter(
+                Q(feed_date__lt=now) | Q(feed_date=now, feed_id__lt=1))[:11],
+            'comments': Comment.objects.filter(
+                post_id=1).order_by('created', 'id'),
+            'follow_exists': Follow.objects.filter(user_id=1, author_id=2),
+            'followers': Follow.objects.filter(
+                author_id=1).order_by('user_id').values('user_id')[:1000],
+        }
+
+    def test_hot_queries_use_indexes(self):
+        tables = (
+            Post._meta.db_table, Comment._meta.db_table,
+            Follow._meta.db_table)
+        for name, queryset in self.queries().items():
+            with self.subTest(query=name):
+                plan = self.plan(queryset)
+                for step in plan:
+                    self.assertNotIn('TEMP B-TREE', step)
+                    for table in tables:
+                        self.assertNotEqual(step, f'SCAN {table}')
+                self.assertTrue(
+                    any('INDEX' in step for step in plan), plan)
@@ -1,12 +1,30 @@
-from django.test import TestCase, Client
+import json
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.test import (
+    TestCase, TransactionTestCase, Client, override_settings)
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from django import forms
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import F
+from django.test.utils import CaptureQueriesContext
 
-from ..models import Post, Group, Comment, Follow
+from ..models import (
+    AuthorStats, Post, Group, Comment, Follow, FeedEntry, FollowSuggestion,
+    TrendingScore)
+from .. import (
+    feed, follows, generations, suggestions, thumbnails, trending)
+from ..cards import card_key
+from .. import views
 from ..forms import PostForm
+from ..paginators import CursorPaginator, encode_cursor
+from ..search import SEARCH_TABLE
 
 
 User = get_user_model()
@@ -182,6 +200,110 @@ class PaginatorTest(TestCase):
                 self.assertEqual(len_page, qnt)
 
 
+class CursorPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='Anonimus')
+        cls.guest_client = Client()
+        cls.group = Group.objects.create(
+            title='Test group',
+            slug='test-slug',
+            description='Test description')
+        Post.objects.bulk_create([Post(
+            text=f'Тестовый пост {i}',
+            author=cls.user,
+            group=cls.group) for i in range(13)])
+
+    @classmethod
+    def setUp(self):
+        cache.clear()
+
+    def test_cursor_pages(self):
+        """Курсоры ведут по страницам без OFFSET."""
+        addresses = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user.username})
+        )
+        expected = list(Post.objects.order_by(
+            '-pub_date', '-id').values_list('id', flat=True))
+        for address in addresses:
+            with self.subTest(address=address):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.guest_client.get(address, {'cursor': ''})
+                    first = response.context['page_obj']
+                    response = self.guest_client.get(
+                        address, {'cursor': first.next_cursor})
+                    second = response.context['page_obj']
+                sql = ' '.join(q['sql'] for q in queries).upper()
+                self.assertNotIn('OFFSET', sql)
+                self.assertEqual(
+                    [post.id for post in first] + [post.id for post in second],
+                    expected)
+                self.assertFalse(first.has_previous())
+                self.assertFalse(second.has_next())
+                response = self.guest_client.get(
+                    address, {'cursor': second.previous_cursor})
+                self.assertEqual(
+                    [post.id for post in response.context['page_obj']],
+                    expected[:10])
+
+    def test_cursor_paginator_without_count(self):
+        paginator = CursorPaginator(Post.objects.all(), 5)
+        with CaptureQueriesContext(connection) as queries:
+            page = paginator.get_page(None)
+            page = paginator.get_page(page.next_cursor)
+        self.assertEqual(len(queries), 2)
+        for query in queries:
+            self.assertNotIn('COUNT(', query['sql'].upper())
+            self.assertNotIn('OFFSET', query['sql'].upper())
+        self.assertTrue(page.has_next())
+        self.assertTrue(page.has_previous())
+
+    def test_invalid_cursor(self):
+        response = self.guest_client.get(
+            reverse('posts:index'), {'cursor': 'garbage'})
+        self.assertEqual(len(response.context['page_obj']), 10)
+
+    def test_pager_links_are_cursors(self):
+        """С первой страницы дальше ведёт курсор, а не ?page=."""
+        response = self.guest_client.get(reverse('posts:index'))
+        page = response.context['page_obj']
+        self.assertContains(response, f'?cursor={page.next_cursor}')
+        self.assertNotContains(response, '?page=')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.guest_client.get(
+                reverse('posts:index'), {'cursor': page.next_cursor})
+        for query in queries:
+            self.assertNotIn('COUNT(', query['sql'].upper())
+        self.assertEqual(len(response.context['page_obj']), 3)
+        old = self.guest_client.get(reverse('posts:index'), {'page': 2})
+        self.assertEqual(
+            list(old.context['page_obj']),
+            list(response.context['page_obj']))
+        self.assertContains(
+            old, f'?cursor={old.context["page_obj"].previous_cursor}')
+
+    def test_cursor_with_nested_values(self):
+        """Токен с вложенными значениями открывает первую страницу."""
+        cursors = [
+            encode_cursor('n', [{'a': 1}, 2]),
+            encode_cursor('n', [[1], 2]),
+            encode_cursor('n', ['не дата', 2]),
+        ]
+        for cursor in cursors:
+            with self.subTest(cursor=cursor):
+                response = self.guest_client.get(
+                    reverse('posts:index'), {'cursor': cursor})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.context['page_obj']), 10)
+                response = self.guest_client.get(
+                    reverse('posts:api_posts'), {'cursor': cursor})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.json()['results']), 10)
+
+
 class ImageViewTest(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -288,6 +410,28 @@ class CommentViewTest(TestCase):
             follow=True)
         self.assertEqual(self.post.comments.count(), count)
 
+    def test_comments_paginated(self):
+        Comment.objects.bulk_create([
+            Comment(post=self.post, author=self.user, text=f'Комментарий {i}')
+            for i in range(25)])
+        newest = Comment.objects.filter(post=self.post).order_by(
+            '-created', '-id').first()
+        response = self.guest_client.get(reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.id}))
+        comments = response.context['comments']
+        self.assertEqual(len(comments), views.COMMENTS_PER_PAGE)
+        self.assertEqual(comments[0], newest)
+        self.assertContains(response, 'Показать ещё')
+        response = self.guest_client.get(reverse(
+            'posts:post_comments', kwargs={'post_id': self.post.id}),
+            {'cursor': comments.next_cursor})
+        self.assertEqual(len(response.context['comments']), 6)
+        self.assertContains(response, 'New comment')
+        self.assertNotContains(response, 'Показать ещё')
+        response = self.guest_client.get(reverse(
+            'posts:post_comments', kwargs={'post_id': self.post.id + 100}))
+        self.assertEqual(response.status_code, 404)
+
 
 class CacheTest(TestCase):
     @classmethod
@@ -307,13 +451,13 @@ class CacheTest(TestCase):
     def test_cache_index_page(self):
         response = self.guest_client.get(reverse('posts:index'))
         cache_check = response.content
-        post = Post.objects.get(pk=1)
-        post.delete()
         response = self.guest_client.get(reverse('posts:index'))
         self.assertEqual(response.content, cache_check)
-        cache.clear()
+        post = Post.objects.get(pk=1)
+        post.delete()
         response = self.guest_client.get(reverse('posts:index'))
         self.assertNotEqual(response.content, cache_check)
+        self.assertNotContains(response, 'Тестовый пост')
 
 
 class FollowTest(TestCase):
@@ -367,3 +511,784 @@ class FollowTest(TestCase):
             kwargs={'username': self.admin.username}))
         response = self.guest.get(reverse('posts:follow_index'))
         self.assertIsNone(response.context)
+
+
+class BulkFollowTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='user')
+        cls.authors = [
+            User.objects.create(username=f'author{i}') for i in range(3)]
+        cls.auth_user = Client()
+        cls.auth_user.force_login(cls.user)
+
+    def bulk(self, **payload):
+        return self.auth_user.post(
+            reverse('posts:follow_bulk'), data=json.dumps(payload),
+            content_type='application/json')
+
+    def test_follow_is_single_insert(self):
+        address = reverse(
+            'posts:profile_follow', kwargs={'username': 'author0'})
+        with CaptureQueriesContext(connection) as queries:
+            self.auth_user.get(address)
+        writes = [
+            query['sql'] for query in queries
+            if query['sql'].startswith(('INSERT', 'DELETE', 'UPDATE'))
+            and 'posts_follow ' in query['sql']]
+        self.assertEqual(len(writes), 1, writes)
+        self.auth_user.get(address)
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertEqual(
+            AuthorStats.objects.get(user=self.user).following_count, 1)
+
+    def test_bulk(self):
+        response = self.bulk(follow=['author0', 'author1', 'user', 'nobody'])
+        self.assertEqual(
+            sorted(response.json()['followed']), ['author0', 'author1'])
+        response = self.bulk(
+            follow=['author1', 'author2'], unfollow=['author0', 'author0'])
+        self.assertEqual(response.json(), {
+            'followed': ['author2'], 'unfollowed': ['author0']})
+        self.assertEqual(
+            set(Follow.objects.values_list('author__username', flat=True)),
+            {'author1', 'author2'})
+        self.assertEqual(
+            AuthorStats.objects.get(user=self.user).following_count, 2)
+
+    def test_follower_profile_refreshed(self):
+        """Счёт подписок в профиле подписчика не берётся из старого кэша."""
+        address = reverse('posts:profile', kwargs={'username': 'user'})
+        self.assertContains(self.auth_user.get(address), 'подписок 0')
+        self.bulk(follow=['author0', 'author1'])
+        self.assertContains(self.auth_user.get(address), 'подписок 2')
+        self.bulk(unfollow=['author0'])
+        self.assertContains(self.auth_user.get(address), 'подписок 1')
+
+    def test_without_returning(self):
+        with mock.patch.object(
+                follows, '_supports_returning', return_value=False):
+            self.bulk(follow=['author0', 'author1'])
+            response = self.bulk(
+                follow=['author0'], unfollow=['author1', 'author2'])
+        self.assertEqual(response.json(), {
+            'followed': [], 'unfollowed': ['author1']})
+
+    def test_bad_payload(self):
+        response = self.auth_user.post(
+            reverse('posts:follow_bulk'), data='[',
+            content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+class FeedTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='user')
+        cls.admin = User.objects.create(username='admin')
+        cls.auth_user = Client()
+        cls.auth_user.force_login(cls.user)
+
+    def test_fan_out_on_create(self):
+        Follow.objects.create(user=self.user, author=self.admin)
+        post = Post.objects.create(author=self.admin, text='Новый пост')
+        self.assertTrue(
+            FeedEntry.objects.filter(user=self.user, post=post).exists())
+
+    def test_follow_backfills_and_unfollow_trims(self):
+        Post.objects.create(author=self.admin, text='Старый пост')
+        self.auth_user.get(reverse(
+            'posts:profile_follow',
+            kwargs={'username': self.admin.username}))
+        self.assertEqual(FeedEntry.objects.filter(user=self.user).count(), 1)
+        self.auth_user.get(reverse(
+            'posts:profile_unfollow',
+            kwargs={'username': self.admin.username}))
+        self.assertFalse(FeedEntry.objects.filter(user=self.user).exists())
+
+
+@mock.patch.object(feed, 'FANOUT_INLINE_LIMIT', 2)
+@mock.patch.object(feed, 'FANOUT_BATCH_SIZE', 2)
+class LargeFanOutTest(TransactionTestCase):
+    """Большая раздача идёт после COMMIT публикации, пачками."""
+
+    def setUp(self):
+        self.author = User.objects.create(username='author')
+        self.readers = [
+            User.objects.create(username=f'reader{i}') for i in range(5)]
+        Follow.objects.bulk_create([
+            Follow(user=reader, author=self.author)
+            for reader in self.readers])
+
+    def test_fan_out_after_commit(self):
+        with transaction.atomic():
+            post = Post.objects.create(author=self.author, text='Пост')
+            self.assertFalse(FeedEntry.objects.filter(post=post).exists())
+        self.assertEqual(
+            FeedEntry.objects.filter(post=post).count(), len(self.readers))
+
+    def test_small_fan_out_inline(self):
+        Follow.objects.filter(user__in=self.readers[2:]).delete()
+        with transaction.atomic():
+            post = Post.objects.create(author=self.author, text='Пост')
+            self.assertEqual(FeedEntry.objects.filter(post=post).count(), 2)
+
+
+class CardCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='author')
+        cls.authorized_client = Client()
+        cls.authorized_client.force_login(cls.user)
+
+    @classmethod
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(author=self.user, text='Пост')
+
+    def test_card_served_from_cache(self):
+        cache.set(card_key(self.post), '<p>из кэша</p>')
+        response = self.authorized_client.get(reverse(
+            'posts:profile', kwargs={'username': self.user.username}))
+        self.assertContains(response, '<p>из кэша</p>')
+
+    def test_edit_bumps_version(self):
+        old_key = card_key(self.post)
+        self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': self.post.id}),
+            data={'text': 'Новый текст'})
+        self.post.refresh_from_db()
+        self.assertNotEqual(card_key(self.post), old_key)
+
+    def test_author_change_bumps_version(self):
+        old_key = card_key(self.post)
+        self.user.first_name = 'Лев'
+        self.user.save()
+        self.post.refresh_from_db()
+        self.assertNotEqual(card_key(self.post), old_key)
+        self.user.save(update_fields=['last_login'])
+        self.assertEqual(
+            Post.objects.get(pk=self.post.pk).version, self.post.version)
+
+
+class GenerationCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='author')
+        cls.reader = User.objects.create(username='reader')
+        cls.authorized_client = Client()
+        cls.authorized_client.force_login(cls.user)
+        cls.reader_client = Client()
+        cls.reader_client.force_login(cls.reader)
+
+    @classmethod
+    def setUp(self):
+        cache.clear()
+
+    def test_create_invalidates_index(self):
+        """Новый пост виден сразу, а не после истечения кэша."""
+        self.authorized_client.get(reverse('posts:index'))
+        self.authorized_client.post(
+            reverse('posts:post_create'), data={'text': 'Свежий пост'})
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, 'Свежий пост')
+
+    def test_author_change_refreshes_listings(self):
+        Follow.objects.create(user=self.reader, author=self.user)
+        Post.objects.create(author=self.user, text='Пост автора')
+        addresses = (
+            reverse('posts:index'), reverse('posts:follow_index'))
+        for address in addresses:
+            self.reader_client.get(address)
+        self.user.first_name = 'Лев'
+        self.user.last_name = 'Толстой'
+        self.user.save()
+        for address in addresses:
+            with self.subTest(address=address):
+                self.assertContains(
+                    self.reader_client.get(address), 'Лев Толстой')
+
+    def test_group_slug_change_refreshes_listings(self):
+        group = Group.objects.create(
+            title='Группа', slug='old', description='-')
+        Post.objects.create(author=self.user, text='Пост', group=group)
+        old = reverse('posts:group_list', kwargs={'slug': 'old'})
+        self.client.get(reverse('posts:index'))
+        self.client.get(old)
+        group.slug = 'new'
+        group.save()
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(
+            response, reverse('posts:group_list', kwargs={'slug': 'new'}))
+        self.assertEqual(self.client.get(old).status_code, 404)
+
+    def test_listing_served_from_cache(self):
+        self.authorized_client.get(reverse('posts:index'))
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertTemplateNotUsed(response, 'posts/index.html')
+
+    def test_follow_invalidates_feed(self):
+        Post.objects.create(author=self.user, text='Пост автора')
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        self.assertNotContains(response, 'Пост автора')
+        self.reader_client.get(reverse(
+            'posts:profile_follow', kwargs={'username': self.user.username}))
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        self.assertContains(response, 'Пост автора')
+
+    def test_stale_page_served_while_locked(self):
+        """Пока другой запрос пересчитывает страницу, отдаётся старая."""
+        self.authorized_client.get(reverse('posts:index'))
+        Post.objects.create(author=self.user, text='Свежий пост')
+        with mock.patch.object(generations.cache, 'add', return_value=False):
+            response = self.authorized_client.get(reverse('posts:index'))
+        self.assertTemplateNotUsed(response, 'posts/index.html')
+        self.assertNotContains(response, 'Свежий пост')
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, 'Свежий пост')
+
+    def test_feeds_not_shared(self):
+        """Ленты разных читателей лежат под разными ключами."""
+        Follow.objects.create(user=self.reader, author=self.user)
+        Post.objects.create(author=self.user, text='Пост автора')
+        self.reader_client.get(reverse('posts:follow_index'))
+        with mock.patch.object(generations.cache, 'add', return_value=False):
+            response = self.authorized_client.get(
+                reverse('posts:follow_index'))
+        self.assertNotContains(response, 'Пост автора')
+
+    def test_early_expiry(self):
+        page = generations.CachedPage(None, 'gen', delta=0.1)
+        self.assertTrue(page.is_fresh('gen'))
+        self.assertFalse(page.is_fresh('other'))
+        page.soft_expires -= generations.LISTING_SOFT_TIMEOUT
+        self.assertFalse(page.is_fresh('gen'))
+        # Долгий пересчёт начинается заранее, ещё до мягкого срока.
+        page = generations.CachedPage(None, 'gen', delta=10 ** 6)
+        with mock.patch.object(
+                generations.random, 'random', return_value=0.5):
+            self.assertFalse(page.is_fresh('gen'))
+
+
+class GenerationCommitTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_bump_repeated_after_commit(self):
+        """После COMMIT поколение снова новое, откат второй смены не даёт."""
+        scope = generations.index_scope()
+        before = generations.current([scope])
+        with transaction.atomic():
+            generations.bump(scope)
+            during = generations.current([scope])
+            self.assertNotEqual(during, before)
+        self.assertNotIn(generations.current([scope]), (before, during))
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                generations.bump(scope)
+                during = generations.current([scope])
+                raise RuntimeError
+        self.assertEqual(generations.current([scope]), during)
+
+
+class HolePunchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='author')
+        cls.reader = User.objects.create(username='reader')
+        cls.author_client = Client()
+        cls.author_client.force_login(cls.author)
+        cls.reader_client = Client()
+        cls.reader_client.force_login(cls.reader)
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(author=self.author, text='Пост')
+
+    def test_index_shared_between_users(self):
+        """Тело страницы общее, меню у каждого своё."""
+        self.author_client.get(reverse('posts:index'))
+        for client, own, foreign in (
+                (self.reader_client, 'Пользователь: reader',
+                 'Пользователь: author'),
+                (self.client, 'Войти', 'Пользователь:')):
+            with self.subTest(own=own):
+                response = client.get(reverse('posts:index'))
+                self.assertTemplateNotUsed(response, 'posts/index.html')
+                self.assertContains(response, own)
+                self.assertNotContains(response, foreign)
+                self.assertNotContains(response, '<!--hole:')
+
+    def test_follow_button_per_user(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        address = reverse('posts:profile', kwargs={'username': 'author'})
+        self.assertContains(self.reader_client.get(address), 'Отписаться')
+        response = self.author_client.get(address)
+        self.assertTemplateNotUsed(response, 'posts/profile.html')
+        self.assertNotContains(response, 'Отписаться')
+        self.assertNotContains(response, 'Подписаться')
+        self.assertNotContains(self.client.get(address), 'Подписаться')
+
+    def test_post_detail_fragments(self):
+        address = reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.id})
+        response = self.author_client.get(address)
+        self.assertContains(response, 'редактировать запись')
+        self.assertContains(response, 'csrfmiddlewaretoken')
+        response = self.reader_client.get(address)
+        self.assertNotContains(response, 'редактировать запись')
+        self.assertContains(response, 'Добавить комментарий')
+        self.assertNotContains(
+            self.client.get(address), 'Добавить комментарий')
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='author')
+        cls.reader = User.objects.create(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='-')
+        cls.authorized_client = Client()
+        cls.authorized_client.force_login(cls.user)
+        cls.reader_client = Client()
+        cls.reader_client.force_login(cls.reader)
+
+    @classmethod
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(
+            author=self.user, text='Пост', group=self.group)
+
+    def addresses(self):
+        return [
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+            reverse('posts:profile', kwargs={'username': 'author'}),
+            reverse('posts:group_list', kwargs={'slug': 'group'}),
+        ]
+
+    def test_not_modified(self):
+        """На 304 уходит только валидатор: сессия и пользователь в кэше."""
+        for address in self.addresses():
+            with self.subTest(address=address):
+                etag = self.reader_client.get(address)['ETag']
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.reader_client.get(
+                        address, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(len(queries), 1)
+
+    def test_validator_without_aggregates(self):
+        """Валидатор не агрегирует посты и комментарии."""
+        for address in self.addresses():
+            with self.subTest(address=address):
+                etag = self.reader_client.get(address)['ETag']
+                with CaptureQueriesContext(connection) as queries:
+                    self.reader_client.get(address, HTTP_IF_NONE_MATCH=etag)
+                sql = queries[0]['sql'].upper()
+                self.assertNotIn('COUNT(', sql)
+                self.assertNotIn('SUM(', sql)
+
+    def test_last_modified(self):
+        for address in self.addresses():
+            with self.subTest(address=address):
+                last_modified = self.reader_client.get(
+                    address)['Last-Modified']
+                response = self.reader_client.get(
+                    address, HTTP_IF_MODIFIED_SINCE=last_modified)
+                self.assertEqual(response.status_code, 304)
+
+    def test_new_post_refreshes_group(self):
+        address = self.addresses()[2]
+        etag = self.reader_client.get(address)['ETag']
+        Post.objects.create(author=self.user, text='Ещё', group=self.group)
+        response = self.reader_client.get(address, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_changes_refresh_etag(self):
+        changes = [
+            lambda: Post.objects.filter(pk=self.post.pk).update(
+                version=F('version') + 1),
+            lambda: Comment.objects.create(
+                post=self.post, author=self.reader, text='Новый'),
+            lambda: Post.objects.create(
+                author=self.user, text='Ещё', group=self.group),
+        ]
+        address = self.addresses()[0]
+        for change in changes:
+            with self.subTest(change=change):
+                etag = self.reader_client.get(address)['ETag']
+                change()
+                response = self.reader_client.get(
+                    address, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+    def test_etag_depends_on_viewer(self):
+        address = self.addresses()[1]
+        etag = self.reader_client.get(address)['ETag']
+        response = self.authorized_client.get(
+            address, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        Follow.objects.create(user=self.reader, author=self.user)
+        response = self.reader_client.get(address, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+class ApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='author', first_name='Лев')
+        cls.reader = User.objects.create(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='-')
+        Follow.objects.create(user=cls.reader, author=cls.user)
+        cls.posts = [
+            Post.objects.create(
+                author=cls.user, text=f'Пост {i}', group=cls.group)
+            for i in range(15)]
+        Comment.objects.create(
+            post=cls.posts[0], author=cls.reader, text='Комментарий')
+        cls.reader_client = Client()
+        cls.reader_client.force_login(cls.reader)
+
+    def test_posts_pages(self):
+        address = reverse('posts:api_posts')
+        first = self.client.get(address).json()
+        self.assertEqual(len(first['results']), 10)
+        self.assertEqual(first['results'][0]['id'], self.posts[-1].id)
+        self.assertEqual(first['results'][0]['author'], 'author')
+        self.assertEqual(first['results'][0]['group'], 'group')
+        self.assertIsNone(first['previous'])
+        second = self.client.get(address, {'cursor': first['next']}).json()
+        self.assertEqual(
+            [row['id'] for row in second['results']],
+            [post.id for post in reversed(self.posts[:5])])
+        self.assertIsNone(second['next'])
+
+    def test_sparse_fields(self):
+        address = reverse('posts:api_posts')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(address, {'fields': 'id,author'})
+        self.assertEqual(set(response.json()['results'][0]), {'id', 'author'})
+        self.assertNotIn('"text"', queries[-1]['sql'])
+        response = self.client.get(address, {'fields': 'id,secret'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_endpoints(self):
+        responses = {
+            reverse('posts:api_groups'): 1,
+            reverse('posts:api_group_posts', kwargs={'slug': 'group'}): 10,
+            reverse(
+                'posts:api_profile_posts', kwargs={'username': 'author'}): 10,
+            reverse(
+                'posts:api_post_comments',
+                kwargs={'post_id': self.posts[0].id}): 1,
+        }
+        for address, count in responses.items():
+            with self.subTest(address=address):
+                response = self.client.get(address)
+                self.assertEqual(len(response.json()['results']), count)
+        profile = self.client.get(reverse(
+            'posts:api_profile', kwargs={'username': 'author'})).json()
+        self.assertEqual(profile['first_name'], 'Лев')
+        self.assertEqual(profile['posts_count'], 15)
+        self.assertEqual(profile['followers_count'], 1)
+        response = self.client.get(reverse(
+            'posts:api_profile', kwargs={'username': 'nobody'}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_follow_feed(self):
+        address = reverse('posts:api_follow')
+        self.assertEqual(self.client.get(address).status_code, 401)
+        response = self.reader_client.get(address, {'limit': 20})
+        self.assertEqual(len(response.json()['results']), 15)
+
+    def test_follow_feed_cursor(self):
+        """Лента листается по строкам ленты, одинаковые даты не теряются."""
+        FeedEntry.objects.update(pub_date=self.posts[0].pub_date)
+        address = reverse('posts:api_follow')
+        first = self.reader_client.get(address).json()
+        second = self.reader_client.get(
+            address, {'cursor': first['next']}).json()
+        ids = [row['id'] for row in first['results'] + second['results']]
+        self.assertCountEqual(ids, [post.id for post in self.posts])
+        self.assertIsNone(second['next'])
+        response = self.reader_client.get(
+            reverse('posts:follow_index'), {'cursor': first['next']})
+        self.assertEqual(
+            [post.id for post in response.context['page_obj']],
+            [row['id'] for row in second['results']])
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='author')
+        cls.admin = User.objects.create_superuser(
+            username='root', email='root@example.com', password='pass')
+        cls.guest_client = Client()
+        cls.admin_client = Client()
+        cls.admin_client.force_login(cls.admin)
+
+    @classmethod
+    def setUp(self):
+        cache.clear()
+        self.best = Post.objects.create(
+            author=self.user, text='Кошки кошки кошки')
+        self.worse = Post.objects.create(
+            author=self.user,
+            text='Длинный пост про собак, в конце упомянуты кошки')
+        self.other = Post.objects.create(author=self.user, text='Про собак')
+        self.comment = Comment.objects.create(
+            post=self.other, author=self.user, text='А у меня есть кошки')
+
+    def search(self, **params):
+        response = self.guest_client.get(reverse('posts:search'), params)
+        return response.context['page_obj']
+
+    def test_search_ranks_posts_and_comments(self):
+        """Выдача отсортирована по bm25 и включает посты с комментариями."""
+        page = self.search(q='кошки')
+        self.assertEqual(page[0], self.best)
+        self.assertCountEqual(page, [self.best, self.worse, self.other])
+
+    def test_search_keyset_pages(self):
+        Post.objects.bulk_create([
+            Post(author=self.user, text=f'Кошки номер {i}')
+            for i in range(10)])
+        first = self.search(q='кошки')
+        second = self.search(q='кошки', cursor=first.next_cursor)
+        self.assertEqual(len(first) + len(second), 13)
+        self.assertFalse(set(first) & set(second))
+        self.assertFalse(second.has_next())
+        back = self.search(q='кошки', cursor=second.previous_cursor)
+        self.assertEqual(list(back), list(first))
+
+    def test_search_invalid_cursor(self):
+        cursors = [
+            encode_cursor('n', [[1], [2]]),
+            encode_cursor('n', ['x', 1]),
+            encode_cursor('n', [1e400, 'inf']),
+        ]
+        for cursor in cursors:
+            with self.subTest(cursor=cursor):
+                self.assertCountEqual(
+                    self.search(q='кошки', cursor=cursor),
+                    [self.best, self.worse, self.other])
+
+    def test_index_follows_edits(self):
+        self.best.text = 'Теперь про попугаев'
+        self.best.save()
+        self.comment.delete()
+        self.assertEqual(list(self.search(q='кошки')), [self.worse])
+
+    def test_admin_search(self):
+        response = self.admin_client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'кошки'})
+        self.assertEqual(response.context['cl'].result_count, 3)
+        response = self.admin_client.get(
+            reverse('admin:posts_comment_changelist'), {'q': 'кошки'})
+        self.assertEqual(response.context['cl'].result_count, 1)
+
+    def test_rebuild_command(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+        self.assertEqual(len(self.search(q='кошки')), 0)
+        call_command('rebuild_search_index', batch_size=2, stdout=StringIO())
+        self.assertEqual(len(self.search(q='кошки')), 3)
+
+
+class ThumbnailTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='author')
+        cls.authorized_client = Client()
+        cls.authorized_client.force_login(cls.user)
+
+    @override_settings(POST_THUMBNAILS_ASYNC=True)
+    @mock.patch.object(thumbnails, 'get_thumbnail')
+    def test_generates_template_geometries(self, get_thumbnail):
+        post = Post(author=self.user, text='Пост', image='posts/pic.gif')
+        self.assertTrue(thumbnails.queue_thumbnails(post))
+        thumbnails._get_executor().shutdown(wait=True)
+        thumbnails._executor = None
+        get_thumbnail.assert_called_once_with(
+            'posts/pic.gif', '960x339', crop='center', upscale=True)
+
+    @override_settings(POST_THUMBNAILS_ASYNC=True)
+    @mock.patch.object(thumbnails, 'get_thumbnail')
+    def test_skips_duplicates_and_full_queue(self, get_thumbnail):
+        post = Post(author=self.user, text='Пост', image='posts/pic.gif')
+        thumbnails._pending.add(post.image.name)
+        try:
+            self.assertFalse(thumbnails.queue_thumbnails(post))
+            with mock.patch.object(thumbnails, 'THUMBNAIL_QUEUE_SIZE', 1):
+                post.image = 'posts/other.gif'
+                self.assertFalse(thumbnails.queue_thumbnails(post))
+        finally:
+            thumbnails._pending.clear()
+        self.assertFalse(thumbnails.queue_thumbnails(Post(text='Пост')))
+        get_thumbnail.assert_not_called()
+
+    @mock.patch.object(thumbnails, 'get_thumbnail')
+    def test_sync_mode(self, get_thumbnail):
+        post = Post(author=self.user, text='Пост', image='posts/pic.gif')
+        with override_settings(POST_THUMBNAILS_ASYNC=False):
+            self.assertTrue(thumbnails.queue_thumbnails(post))
+        get_thumbnail.assert_called_once()
+        self.assertIsNone(thumbnails._executor)
+
+    @mock.patch.object(thumbnails, 'queue_thumbnails')
+    @mock.patch('django.db.transaction.on_commit', lambda func: func())
+    def test_post_create_queues_thumbnails(self, queue_thumbnails):
+        self.authorized_client.post(
+            reverse('posts:post_create'), data={'text': 'Новый пост'})
+        queue_thumbnails.assert_called_once()
+
+
+class TrendingTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='author')
+        cls.reader = User.objects.create(username='reader')
+        cls.reader_client = Client()
+        cls.reader_client.force_login(cls.reader)
+
+    def setUp(self):
+        cache.clear()
+        self.quiet = Post.objects.create(author=self.author, text='Тихий')
+        self.loud = Post.objects.create(author=self.author, text='Громкий')
+
+    def comment(self, post, times=1):
+        for _ in range(times):
+            Comment.objects.create(
+                post=post, author=self.reader, text='Комментарий')
+
+    def scores(self):
+        return dict(TrendingScore.objects.values_list('post_id', 'score'))
+
+    def test_comments_rank_posts(self):
+        self.comment(self.quiet)
+        self.comment(self.loud, 3)
+        response = self.client.get(reverse('posts:trending'))
+        self.assertEqual(
+            list(response.context['page_obj']), [self.loud, self.quiet])
+
+    def test_cursor_ignored(self):
+        self.comment(self.loud)
+        response = self.client.get(
+            reverse('posts:trending'), {'cursor': 'x'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context['page_obj']), [self.loud])
+
+    def test_follow_lifts_recent_posts(self):
+        self.reader_client.get(reverse(
+            'posts:profile_follow', kwargs={'username': 'author'}))
+        self.assertEqual(
+            set(trending.top_ids()), {self.quiet.id, self.loud.id})
+
+    def test_top_served_from_cache(self):
+        self.comment(self.loud)
+        trending.top_ids()
+        with self.assertNumQueries(0):
+            self.assertEqual(trending.top_ids(), [self.loud.id])
+
+    def test_rebalance_moves_epoch(self):
+        self.comment(self.quiet)
+        self.comment(self.loud, 2)
+        before = self.scores()
+        later = trending.epoch() + timedelta(
+            seconds=trending.TRENDING_HALF_LIFE)
+        trending.rebalance(now=later)
+        after = self.scores()
+        for post_id, score in before.items():
+            self.assertAlmostEqual(after[post_id], score / 2)
+        self.assertEqual(trending.epoch(), later)
+
+    def test_far_future_event_moves_epoch(self):
+        """Событие через тысячи периодов не переполняет множитель."""
+        self.comment(self.quiet)
+        far = trending.epoch() + timedelta(
+            seconds=trending.TRENDING_HALF_LIFE * 2000)
+        trending.record_comment(Comment(post=self.loud, created=far))
+        self.assertEqual(trending.epoch(), far)
+        self.assertEqual(
+            self.scores()[self.loud.id], trending.COMMENT_WEIGHT)
+        self.assertNotIn(self.quiet.id, self.scores())
+
+    def test_rebuild_from_comments(self):
+        self.comment(self.loud, 2)
+        TrendingScore.objects.all().delete()
+        trending.rebalance(rebuild=True)
+        self.assertEqual(trending.top_ids(), [self.loud.id])
+        self.assertAlmostEqual(self.scores()[self.loud.id], 2, places=3)
+
+
+class SuggestionTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader, cls.friend, cls.star, cls.other = [
+            User.objects.create(username=name)
+            for name in ('reader', 'friend', 'star', 'other')]
+        cls.reader_client = Client()
+        cls.reader_client.force_login(cls.reader)
+
+    def setUp(self):
+        cache.clear()
+        # reader -> friend -> star, other -> star: звезду стоит предложить.
+        Follow.objects.bulk_create([
+            Follow(user=self.reader, author=self.friend),
+            Follow(user=self.friend, author=self.star),
+            Follow(user=self.friend, author=self.reader),
+            Follow(user=self.other, author=self.star),
+            Follow(user=self.other, author=self.friend),
+        ])
+
+    def test_compute_suggestions(self):
+        call_command('compute_suggestions', chunk_size=1, stdout=StringIO())
+        self.assertEqual(
+            list(FollowSuggestion.objects.filter(
+                user=self.reader).values_list('author__username', 'score')),
+            [('star', 1.0)])
+        self.assertEqual(
+            list(FollowSuggestion.objects.filter(
+                user=self.other).values_list('author__username', flat=True)),
+            ['reader'])
+
+    def test_compute_before_replacing(self):
+        """Пока идёт расчёт, таблица не тронута: запись — только в конце."""
+        call_command('compute_suggestions', stdout=StringIO())
+        before = FollowSuggestion.objects.count()
+        seen = []
+        scores = suggestions._scores
+
+        def spy(graph, rows):
+            seen.append(FollowSuggestion.objects.count())
+            return scores(graph, rows)
+
+        with mock.patch.object(suggestions, '_scores', side_effect=spy):
+            suggestions.compute(chunk_size=1)
+        self.assertTrue(seen)
+        self.assertEqual(set(seen), {before})
+
+    def test_suggestions_on_feed(self):
+        call_command('compute_suggestions', stdout=StringIO())
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        self.assertContains(response, 'Кого почитать')
+        self.assertContains(response, reverse(
+            'posts:profile_follow', kwargs={'username': 'star'}))
+        Follow.objects.create(user=self.reader, author=self.star)
+        response = self.reader_client.get(reverse(
+            'posts:profile', kwargs={'username': 'friend'}))
+        self.assertNotContains(response, 'Кого почитать')
@@ -0,0 +1,68 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+from sorl.thumbnail import get_thumbnail
+
+
+logger = logging.getLogger(__name__)
+
+# Геометрии из шаблонов card_author.html и post_detail.html.
+THUMBNAIL_GEOMETRIES = (
+    ('960x339', {'crop': 'center', 'upscale': True}),
+)
+THUMBNAIL_WORKERS = 2
+THUMBNAIL_QUEUE_SIZE = 100
+
+_executor = None
+_lock = threading.Lock()
+_pending = set()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails')
+    return _executor
+
+
+def queue_thumbnails(post):
+    """Ставит нарезку миниатюр поста в очередь фонового пула.
+
+    Одна картинка не режется параллельно дважды. Если очередь
+    заполнена, задача отбрасывается: миниатюру лениво сделает шаблон.
+    """
+    if not post.image:
+        return False
+    name = post.image.name
+    if not getattr(settings, 'POST_THUMBNAILS_ASYNC', True):
+        generate_thumbnails(name)
+        return True
+    with _lock:
+        if name in _pending or len(_pending) >= THUMBNAIL_QUEUE_SIZE:
+            return False
+        _pending.add(name)
+        executor = _get_executor()
+    executor.submit(_work, name)
+    return True
+
+
+def _work(name):
+    try:
+        generate_thumbnails(name)
+    finally:
+        with _lock:
+            _pending.discard(name)
+        connections.close_all()
+
+
+def generate_thumbnails(name):
+    try:
+        for geometry, options in THUMBNAIL_GEOMETRIES:
+            get_thumbnail(name, geometry, **options)
+    except Exception:
+        logger.exception('Не удалось нарезать миниатюры для %s', name)
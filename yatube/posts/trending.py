@@ -0,0 +1,149 @@
+"""Популярные посты: очки с экспоненциальным затуханием.
+
+Событие с весом w в момент t добавляет посту w * 2^((t - E) / H), где
+E — эпоха, H — период полураспада. Множитель затухания у всех постов
+общий, поэтому хранить «очки на момент E» достаточно: порядок постов
+совпадает с порядком по текущим очкам. События только прибавляют
+очки одним UPSERT, Comment при этом не сканируется.
+
+Чем дальше от эпохи, тем больше множители, поэтому rebalance
+переносит эпоху на текущий момент: векторно пересчитывает все очки и
+отбрасывает затухшие. weight() зовёт его сам, когда множитель подходит
+к пределу float, так что расписание для rebalance не обязательно.
+"""
+from datetime import timedelta
+
+import numpy as np
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Comment, Post, TrendingEpoch, TrendingScore
+
+
+TRENDING_HALF_LIFE = timedelta(hours=12).total_seconds()
+# Подписка поднимает посты автора не старше окна.
+TRENDING_WINDOW = timedelta(days=7)
+TRENDING_TOP = 100
+TRENDING_CACHE_TIMEOUT = 60
+COMMENT_WEIGHT = 1.0
+FOLLOW_WEIGHT = 3.0
+# Очки, затухшие ниже порога к новой эпохе, удаляются.
+PRUNE_BELOW = 1e-3
+REBALANCE_BATCH_SIZE = 1000
+# Столько периодов от эпохи — и эпоха переносится: 2^1024 уже не float.
+REBALANCE_AFTER_HALF_LIVES = 64
+EPOCH_KEY = 'trending:epoch'
+TOP_KEY = 'trending:top'
+
+
+def epoch():
+    """Текущая эпоха: из кэша, при промахе — из базы."""
+    started = cache.get(EPOCH_KEY)
+    if started is None:
+        started = TrendingEpoch.objects.get_or_create(
+            pk=1, defaults={'started': timezone.now()})[0].started
+        cache.set(EPOCH_KEY, started, None)
+    return started
+
+
+def weight(value, when):
+    """Вклад события в очки, приведённые к эпохе."""
+    exponent = (when - epoch()).total_seconds() / TRENDING_HALF_LIFE
+    if exponent > REBALANCE_AFTER_HALF_LIVES:
+        rebalance(now=max(when, timezone.now()))
+        exponent = (when - epoch()).total_seconds() / TRENDING_HALF_LIFE
+    return value * 2 ** exponent
+
+
+def _upsert(select, params):
+    table = TrendingScore._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} (post_id, score) {select} '
+            f'ON CONFLICT (post_id) DO UPDATE '
+            f'SET score = {table}.score + excluded.score', params)
+
+
+def record_comment(comment):
+    _upsert(
+        'VALUES (%s, %s)',
+        [comment.post_id, weight(COMMENT_WEIGHT, comment.created)])
+
+
+def record_follows(author_ids, when=None):
+    """Поднимает свежие посты авторов, на которых подписались."""
+    author_ids = list(author_ids)
+    if not author_ids:
+        return
+    when = when or timezone.now()
+    _upsert(
+        f'SELECT id, %s FROM {Post._meta.db_table} '
+        f'WHERE author_id IN ({", ".join(["%s"] * len(author_ids))}) '
+        f'AND pub_date >= %s',
+        [weight(FOLLOW_WEIGHT, when), *author_ids,
+         connection.ops.adapt_datetimefield_value(when - TRENDING_WINDOW)])
+
+
+def top_ids():
+    """Упорядоченный топ id постов; между пересчётами лежит в кэше."""
+    ids = cache.get(TOP_KEY)
+    if ids is None:
+        ids = list(TrendingScore.objects.order_by(
+            '-score').values_list('post_id', flat=True)[:TRENDING_TOP])
+        cache.set(TOP_KEY, ids, TRENDING_CACHE_TIMEOUT)
+    return ids
+
+
+def _comment_scores(now):
+    """Очки комментариев окна, посчитанные заново, к эпохе now."""
+    rows = Comment.objects.filter(
+        created__gte=now - TRENDING_WINDOW
+    ).order_by().values_list('post_id', 'created')
+    post_ids = []
+    offsets = []
+    for post_id, created in rows.iterator(chunk_size=REBALANCE_BATCH_SIZE):
+        post_ids.append(post_id)
+        offsets.append((created - now).total_seconds())
+    post_ids, inverse = np.unique(
+        np.array(post_ids, dtype=np.int64), return_inverse=True)
+    weights = COMMENT_WEIGHT * np.exp2(
+        np.array(offsets, dtype=np.float64) / TRENDING_HALF_LIFE)
+    return post_ids, np.bincount(
+        inverse, weights=weights, minlength=len(post_ids))
+
+
+def _rescaled_scores(now):
+    """Сохранённые очки, перенесённые к эпохе now одним умножением."""
+    started = TrendingEpoch.objects.filter(
+        pk=1).values_list('started', flat=True).first() or now
+    rows = np.array(
+        list(TrendingScore.objects.values_list('post_id', 'score')),
+        dtype=np.float64).reshape(-1, 2)
+    factor = np.exp2((started - now).total_seconds() / TRENDING_HALF_LIFE)
+    return rows[:, 0].astype(np.int64), rows[:, 1] * factor
+
+
+def rebalance(rebuild=False, now=None):
+    """Переносит эпоху на now и переписывает очки пачками.
+
+    С rebuild очки считаются заново по комментариям окна; вклад
+    подписок при этом теряется: у Follow нет даты создания.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        if rebuild:
+            post_ids, scores = _comment_scores(now)
+        else:
+            post_ids, scores = _rescaled_scores(now)
+        keep = scores >= PRUNE_BELOW
+        TrendingScore.objects.all().delete()
+        TrendingScore.objects.bulk_create(
+            [TrendingScore(post_id=int(post_id), score=float(score))
+             for post_id, score in zip(post_ids[keep], scores[keep])],
+            batch_size=REBALANCE_BATCH_SIZE)
+        TrendingEpoch.objects.update_or_create(
+            pk=1, defaults={'started': now})
+    cache.set(EPOCH_KEY, now, None)
+    cache.delete(TOP_KEY)
+    return int(keep.sum())
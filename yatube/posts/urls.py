@@ -1,15 +1,21 @@
 from django.urls import path
 
-from . import views
+from . import api, views
 
 
 app_name = 'posts'
 
 urlpatterns = [
     path('', views.index, name='index'),
+    path('trending/', views.trending_index, name='trending'),
+    path('search/', views.post_search, name='search'),
     path('group/<slug:slug>/', views.group_post, name='group_list'),
     path('profile/<str:username>/', views.profile, name='profile'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.post_comments,
+        name='post_comments'),
     path('create/', views.post_create, name='post_create'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
     path(
@@ -17,6 +23,7 @@ urlpatterns = [
         views.add_comment,
         name='add_comment'),
     path('follow/', views.follow_index, name='follow_index'),
+    path('follow/bulk/', views.follow_bulk, name='follow_bulk'),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow,
@@ -27,4 +34,20 @@ urlpatterns = [
         views.profile_unfollow,
         name='profile_unfollow'
     ),
+    path('api/posts/', api.posts, name='api_posts'),
+    path(
+        'api/posts/<int:post_id>/comments/',
+        api.post_comments,
+        name='api_post_comments'),
+    path('api/groups/', api.groups, name='api_groups'),
+    path(
+        'api/groups/<slug:slug>/posts/',
+        api.group_posts,
+        name='api_group_posts'),
+    path('api/profiles/<str:username>/', api.profile, name='api_profile'),
+    path(
+        'api/profiles/<str:username>/posts/',
+        api.profile_posts,
+        name='api_profile_posts'),
+    path('api/follow/', api.follow, name='api_follow'),
 ]
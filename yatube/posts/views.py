@@ -1,27 +1,51 @@
+import json
+
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
-from django.views.decorators.cache import cache_page
+from django.db import transaction
+from django.http import Http404, JsonResponse
+from django.views.decorators.http import condition, require_POST
 
+from core.db import write_transaction
 from posts.forms import PostForm, CommentForm
-from .models import Follow, Post, Group, User
+from . import feed, follows, generations, search, thumbnails, trending
+from .etags import (
+    group_etag, group_last_modified, post_detail_etag,
+    post_detail_last_modified, profile_etag, profile_last_modified)
+from .generations import cache_generation
+from .stats import get_stats
+from .models import Comment, Post, Group, User
+from .paginators import BACKWARD, FORWARD, CursorPaginator
 
 
 POSTS_PER_PAGE = 10
+COMMENTS_PER_PAGE = 20
+COMMENTS_ORDERING = ('-created', '-id')
 
 
-def get_paginator(request, page, num):
+def get_paginator(request, page, num, ordering=('-pub_date', '-id')):
+    cursors = CursorPaginator(page, num, ordering)
+    if 'cursor' in request.GET:
+        return cursors.get_page(request.GET['cursor'])
     paginator = Paginator(page, num)
     page_numder = request.GET.get('page')
     page_obj: Paginator = paginator.get_page(page_numder)
+    # Ссылки на соседние страницы — курсоры: дальше листают без COUNT
+    # и OFFSET, а ?page= остаётся только для старых ссылок.
+    page_obj.next_cursor = page_obj.previous_cursor = None
+    if page_obj.has_next():
+        page_obj.next_cursor = cursors.encode(FORWARD, page_obj[-1])
+    if page_obj.has_previous():
+        page_obj.previous_cursor = cursors.encode(BACKWARD, page_obj[0])
     return page_obj
 
 
-@cache_page(60 / 3, key_prefix='page_obj')
+@cache_generation(lambda request: [generations.index_scope()])
 def index(request):
     template = 'posts/index.html'
     title = 'Последние обновления на сайте'
-    posts = Post.objects.all()
+    posts = Post.objects.select_related('author', 'group')
     page_obj = get_paginator(request, posts, POSTS_PER_PAGE)
     context = {
         'page_obj': page_obj,
@@ -29,10 +53,30 @@ def index(request):
     return render(request, template, context)
 
 
+def trending_index(request):
+    """Популярные посты: топ из кэша, посты страницы — одним запросом."""
+    # Топ — готовый список id, курсору здесь не по чему строить ключ.
+    page_obj = Paginator(trending.top_ids(), POSTS_PER_PAGE).get_page(
+        request.GET.get('page'))
+    posts = Post.objects.select_related('author', 'group').in_bulk(
+        list(page_obj.object_list))
+    page_obj.object_list = [
+        posts[post_id] for post_id in page_obj.object_list
+        if post_id in posts]
+    context = {
+        'page_obj': page_obj,
+        'title': 'Популярные посты'}
+    return render(request, 'posts/index.html', context)
+
+
+@condition(
+    etag_func=group_etag, last_modified_func=group_last_modified)
+@cache_generation(
+    lambda request, slug: [generations.group_scope(slug)])
 def group_post(request, slug):
     template = 'posts/group_list.html'
     group = get_object_or_404(Group, slug=slug)
-    posts = group.groups.all()
+    posts = group.groups.select_related('author')
     description = group.description
     page_obj = get_paginator(request, posts, POSTS_PER_PAGE)
     title = f'Вы в сообществе {group}'
@@ -44,41 +88,81 @@ def group_post(request, slug):
     return render(request, template, context)
 
 
+@condition(
+    etag_func=profile_etag, last_modified_func=profile_last_modified)
+@cache_generation(
+    lambda request, username: [generations.profile_scope(username)])
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
-    count = posts.count()
-    following = author.following.filter(user=request.user.id).exists()
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username)
+    posts = author.posts.select_related('group')
+    stats = get_stats(author)
     page_obj = get_paginator(request, posts, POSTS_PER_PAGE)
     context = {
-        'following': following,
-        'count': count,
+        'count': stats.posts_count,
+        'stats': stats,
         'page_obj': page_obj,
         'author': author
     }
     return render(request, 'posts/profile.html', context)
 
 
+@condition(
+    etag_func=post_detail_etag, last_modified_func=post_detail_last_modified)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
-    author_posts = post.author.posts.all()
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), pk=post_id)
     author_name = post.author
-    form = CommentForm()
-    comments = post.comments.all()
-    user = request.user
-    count = author_posts.count()
+    comments = CursorPaginator(
+        post.comments.select_related('author'),
+        COMMENTS_PER_PAGE, COMMENTS_ORDERING).get_page(None)
+    count = get_stats(post.author).posts_count
     context = {
         'author_name': author_name,
-        'user': user,
         'count': count,
         'post': post,
-        'form': form,
-        'comments': comments
+        'comments': comments,
+        'post_id': post.id
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+def post_comments(request, post_id):
+    """Фрагмент со следующей страницей комментариев поста."""
+    if not Post.objects.filter(pk=post_id).exists():
+        raise Http404
+    comments = CursorPaginator(
+        Comment.objects.filter(post_id=post_id).select_related('author'),
+        COMMENTS_PER_PAGE, COMMENTS_ORDERING
+    ).get_page(request.GET.get('cursor'))
+    context = {
+        'comments': comments,
+        'post_id': post_id
+    }
+    return render(request, 'includes/comments.html', context)
+
+
+def post_search(request):
+    query = request.GET.get('q', '').strip()
+    cursor = request.GET.get('cursor')
+    if search.available():
+        page_obj = search.SearchPaginator(
+            query, POSTS_PER_PAGE).get_page(cursor)
+    else:
+        posts = Post.objects.filter(
+            text__icontains=query
+        ).select_related('author', 'group') if query else Post.objects.none()
+        page_obj = CursorPaginator(posts, POSTS_PER_PAGE).get_page(cursor)
+    context = {
+        'title': 'Поиск',
+        'query': query,
+        'page_obj': page_obj
+    }
+    return render(request, 'posts/search.html', context)
+
+
 @login_required
+@write_transaction
 def post_create(request):
     user = request.user
     form = PostForm(request.POST or None, files=request.FILES or None)
@@ -86,30 +170,41 @@ def post_create(request):
         post = form.save(commit=False)
         post.author = user
         post.save()
+        transaction.on_commit(lambda: thumbnails.queue_thumbnails(post))
         return redirect('posts:profile', username=user.username)
     form = PostForm()
     return render(request, 'posts/create_post.html', {'form': form})
 
 
 @login_required
+@write_transaction
 def post_edit(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author', 'group'), pk=post_id)
     if request.user != post.author:
         return redirect('posts:post_detail', post_id=post_id)
+    old_group_slug = post.group.slug if post.group_id else None
     form = PostForm(
         request.POST or None,
         files=request.FILES or None,
         instance=post)
     if form.is_valid():
-        form.save()
+        post = form.save()
+        if 'image' in form.changed_data:
+            transaction.on_commit(lambda: thumbnails.queue_thumbnails(post))
+        if old_group_slug:
+            generations.bump(generations.group_scope(old_group_slug))
+        generations.bump_followers(post.author_id)
         return redirect('posts:post_detail', post_id=post_id)
     return render(request, 'posts/create_post.html',
                   {'form': form, 'post_id': post_id, 'is_edit': True})
 
 
 @login_required
+@write_transaction
 def add_comment(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author', 'group'), id=post_id)
     form = CommentForm(request.POST or None)
     if form.is_valid():
         comment = form.save(commit=False)
@@ -120,10 +215,14 @@ def add_comment(request, post_id):
 
 
 @login_required
+@cache_generation(
+    lambda request: [generations.follow_scope(request.user.id)])
 def follow_index(request):
     title = 'Избранное'
-    posts = Post.objects.filter(author__following__user=request.user)
-    page_obj = get_paginator(request, posts, POSTS_PER_PAGE)
+    posts = feed.posts(request.user).select_related(
+        'author', 'group').order_by(*feed.FEED_ORDERING)
+    page_obj = get_paginator(
+        request, posts, POSTS_PER_PAGE, feed.FEED_ORDERING)
     context = {
         'title': title,
         'page_obj': page_obj
@@ -132,17 +231,44 @@ def follow_index(request):
 
 
 @login_required
+@write_transaction
 def profile_follow(request, username):
-    user = get_object_or_404(User, username=username)
-    if request.user != user and not user.following.filter(
-            user=request.user.id).exists():
-        Follow.objects.create(user=request.user, author=user)
+    author_id = get_object_or_404(
+        User.objects.values_list('id', flat=True), username=username)
+    follows.follow(request.user, {author_id: username})
     return redirect('posts:profile', username=username)
 
 
 @login_required
+@write_transaction
 def profile_unfollow(request, username):
-    user = get_object_or_404(User, username=username)
-    unfollow = get_object_or_404(Follow, user=request.user, author=user)
-    unfollow.delete()
+    author_id = get_object_or_404(
+        User.objects.values_list('id', flat=True), username=username)
+    follows.unfollow(request.user, {author_id: username})
     return redirect('posts:profile', username=username)
+
+
+@login_required
+@require_POST
+@write_transaction
+def follow_bulk(request):
+    """Массовая подписка и отписка для инструментов импорта.
+
+    Тело — JSON вида {"follow": [логины], "unfollow": [логины]}.
+    """
+    try:
+        payload = json.loads(request.body)
+        to_follow = list(payload.get('follow', []))
+        to_unfollow = list(payload.get('unfollow', []))
+    except (ValueError, AttributeError, TypeError):
+        return JsonResponse({'error': 'Ожидается JSON-объект'}, status=400)
+    if len(to_follow) + len(to_unfollow) > follows.FOLLOW_BULK_LIMIT:
+        return JsonResponse(
+            {'error': f'Не больше {follows.FOLLOW_BULK_LIMIT} логинов'},
+            status=400)
+    user = request.user
+    return JsonResponse({
+        'followed': follows.follow(user, follows.resolve(user, to_follow)),
+        'unfollowed': follows.unfollow(
+            user, follows.resolve(user, to_unfollow)),
+    })
@@ -1,4 +1,5 @@
 import os
+import sys
 
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -11,9 +12,9 @@ ALLOWED_HOSTS = ['*']
 
 
 INSTALLED_APPS = [
-    'posts',
+    'posts.apps.PostsConfig',
     'users',
-    'core',
+    'core.apps.CoreConfig',
     'about',
     'sorl.thumbnail',
     'django.contrib.admin',
@@ -25,6 +26,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -32,6 +34,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.HoleMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
@@ -40,7 +43,7 @@ TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.template_backends.InstrumentedDjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -63,15 +66,50 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # Сколько секунд ждать писателя, прежде чем вернуть ошибку.
+        'OPTIONS': {'timeout': 20},
+        'CONN_MAX_AGE': 600,
     }
 }
 
+# Выполняются для каждого нового соединения, см. core.db.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    # Отрицательное значение — размер в КиБ, а не в страницах.
+    'cache_size': -64 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+
+TESTING = sys.argv[1:2] == ['test'] or 'pytest' in sys.modules
 
+# Файловый кэш общий для всех воркеров на машине; под тестами — кэш в
+# памяти, чтобы прогоны не видели записей друг друга.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.InstrumentedSQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100_000,
+        },
     }
 }
+if TESTING:
+    CACHES['default'] = {
+        'BACKEND': 'core.cache.InstrumentedLocMemCache',
+    }
+
+# Сессия и пользователь читаются из кэша, база — только при промахе.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+# ModelBackend остаётся в списке: сессии, созданные до кэширующего
+# бэкенда, хранят его путь, и без него пользователей бы разлогинило.
+AUTHENTICATION_BACKENDS = [
+    'core.auth.CachedModelBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
 
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -115,3 +153,15 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
+
+POST_IMAGE_MAX_SIDE = 2048
+POST_IMAGE_MAX_PIXELS = 50_000_000
+POST_IMAGE_FORMAT = 'JPEG'
+POST_IMAGE_QUALITY = 85
+
+# Под тестами миниатюры режутся синхронно: фоновый поток не должен писать
+# во временный MEDIA_ROOT, который тест уже удаляет.
+POST_THUMBNAILS_ASYNC = not TESTING
+
+# Пустой токен: метрики видны только сотрудникам.
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')